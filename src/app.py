@@ -1,23 +1,29 @@
-from flask import Flask, render_template, request, send_from_directory
+from flask import Flask, Response, render_template, request, send_from_directory
 from flask_socketio import SocketIO, emit
 from apscheduler.schedulers.background import BackgroundScheduler
 from urllib.parse import unquote
+from threading import Thread
 import os
-from enrich import enrich_subscription
-from subscription_processing import process_subscription
-from util import logger
+from enrich import enrich_subscription, clear_metadata_cache
+from subscription_processing import process_subscription, process_subscriptions
+from util import logger, clean_filename_part, json_dumps
 from database import (
     get_config, get_all_subscriptions, get_subscription_by_url, add_subscription,
     remove_subscription, get_parameters, set_parameters, update_subscription,
-    init_database, get_channel_video_stats
+    init_database, get_channel_video_stats, get_videos_by_channel, iter_all_videos
 )
 # Import WebSocket utilities
-from websocket_events import init_websocket_events, emit_subscription_event
+from websocket_events import (
+    init_websocket_events, emit_subscription_event, client_connected, client_disconnected
+)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this in production
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Templates build poster paths with the same cleaning the thumbnail service uses on disk
+app.add_template_filter(clean_filename_part, "clean_filename")
+
 # Initialize WebSocket events
 init_websocket_events(socketio)
 
@@ -30,9 +36,9 @@ def scheduled_task():
     parameters = get_parameters()
     subscriptions = get_all_subscriptions()
 
+    process_subscriptions(subscriptions, parameters)
+    # Update the subscriptions in database after processing
     for subscription in subscriptions:
-        process_subscription(subscription, parameters)
-        # Update the subscription in database after processing
         update_subscription(subscription)
 
 
@@ -133,7 +139,6 @@ def add_subscription_route():
 
             # Start enrichment process in background (this will emit more events)
             # We need to do this after returning the response, so let's use a background task
-            from threading import Thread
             def enrich_in_background():
                 if enrich_subscription(new_subscription):
                     # Update the database with enriched data
@@ -177,6 +182,12 @@ def set_parameters_route():
     return "", 204  # No content, because we're not swapping any HTML
 
 
+@app.route("/clear-cache", methods=["POST"])
+def clear_cache_route():
+    clear_metadata_cache()
+    return "", 204
+
+
 @app.route("/update/<path:url>", methods=["POST"])
 def update_subscription_route(url):
     decoded_url = unquote(url)
@@ -206,8 +217,6 @@ def update_subscription_route(url):
 @app.route("/videos/<channel_id>")
 def get_videos_for_channel(channel_id):
     """Route for HTMX to load videos for a specific channel."""
-    from database import get_videos_by_channel
-
     if channel_id == "unknown" or not channel_id:
         videos = []
     else:
@@ -216,11 +225,26 @@ def get_videos_for_channel(channel_id):
     return render_template("_video_list.html", videos=videos)
 
 
+@app.route("/api/videos")
+def all_videos_json():
+    """Stream all videos as a JSON array without building the full list in memory."""
+    return Response(_stream_json_array(iter_all_videos()), mimetype="application/json")
+
+
+def _stream_json_array(items):
+    """Encode an iterable as a JSON array, one element per chunk."""
+    yield b"["
+    for index, item in enumerate(items):
+        yield (b"," if index else b"") + json_dumps(item)
+    yield b"]"
+
+
 # WebSocket event handlers
 @socketio.on('connect')
 def handle_connect():
     """Handle new WebSocket connection."""
     logger.info('Client connected to WebSocket')
+    client_connected()
     emit('connected', {'message': 'Connected to YTDLP manager'})
 
 
@@ -228,6 +252,7 @@ def handle_connect():
 def handle_disconnect():
     """Handle WebSocket disconnection."""
     logger.info('Client disconnected from WebSocket')
+    client_disconnected()
 
 
 # Initialize database on startup
@@ -25,19 +25,25 @@ from database.channels import (
     get_all_channels,
     add_channel,
     get_channel_by_id,
+    get_channel_avatar,
+    set_channel_avatar,
     channel_exists
 )
 
 # Import video functions
 from database.videos import (
     get_all_videos,
+    iter_all_videos,
     get_videos_by_channel,
     get_channel_video_stats,
     add_video,
+    add_videos,
     update_video_filesize,
     get_video_by_id,
     video_exists,
-    format_filesize
+    existing_video_ids,
+    format_filesize,
+    scan_downloaded_video_ids
 )
 
 
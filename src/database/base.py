@@ -1,4 +1,5 @@
 import os
+import re
 import sqlite3
 from pony.orm import Database, db_session
 from util import logger
@@ -10,6 +11,12 @@ db = Database()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATABASE_PATH = os.path.join(BASE_DIR, "config", "app.db")
 
+# SQL expression for updated_at; local time, like the created_at values Python writes
+LOCAL_NOW_SQL = "datetime('now', 'localtime')"
+
+# Bumped whenever a migration is appended to _SCHEMA_MIGRATIONS (stored in PRAGMA user_version)
+SCHEMA_VERSION = 4
+
 
 def init_database():
     """Initialize the database and create tables."""
@@ -45,6 +52,9 @@ def init_database():
     else:
         logger.info("Creating new database tables...")
         db.generate_mapping(create_tables=True)
+        _set_schema_version(SCHEMA_VERSION)
+
+    _ensure_timestamp_triggers()
 
 
 def _migrate_database_schema():
@@ -65,7 +75,7 @@ def _migrate_database_schema():
                     url TEXT NOT NULL UNIQUE,
                     type TEXT,
                     created_at TIMESTAMP NOT NULL,
-                    updated_at TIMESTAMP NOT NULL,
+                    updated_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
                     channel INTEGER REFERENCES channels(id)
                 )
             ''')
@@ -97,6 +107,8 @@ def _migrate_database_schema():
             ''')
             conn.commit()
 
+        _apply_schema_migrations(conn)
+
         logger.info("Database schema setup completed")
 
     except Exception as e:
@@ -107,6 +119,124 @@ def _migrate_database_schema():
         conn.close()
 
 
+def _drop_expected_filename_column(cursor):
+    """Drop the obsolete videos.expected_filename column left by older schemas."""
+    cursor.execute("PRAGMA table_info(videos)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'expected_filename' in columns:
+        logger.info("Dropping obsolete videos.expected_filename column")
+        cursor.execute("ALTER TABLE videos DROP COLUMN expected_filename")
+
+
+# The updated_at column definition: name, type, then any constraints up to the next column or line end
+_UPDATED_AT_COLUMN = re.compile(r'("?updated_at"?\s+\w+)[^,)\n]*')
+
+
+def _add_updated_at_defaults(cursor):
+    """Rebuild config and subscriptions so updated_at defaults to the current local time.
+
+    SQLite cannot alter a column default in place, so the tables are recreated
+    from their own CREATE statements, with only the updated_at definition
+    changed, and their rows copied over.
+    """
+    for table in ('config', 'subscriptions'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        defaults = {row[1]: row[4] for row in cursor.fetchall()}
+        if defaults.get('updated_at', 'missing') is not None:
+            # No such table, or updated_at already has a default
+            continue
+
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        row = cursor.fetchone()
+
+        create_sql = _UPDATED_AT_COLUMN.sub(rf"\1 DEFAULT ({LOCAL_NOW_SQL}) NOT NULL", row[0], count=1)
+        _rebuild_table(cursor, table, create_sql)
+    cursor.execute('CREATE INDEX IF NOT EXISTS "idx_subscriptions__channel" ON "subscriptions" ("channel")')
+
+
+def _rebuild_table(cursor, table, create_sql):
+    """Recreate a table from create_sql, keeping its rows."""
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    cursor.execute(create_sql)
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = ", ".join(row[1] for row in cursor.fetchall())
+    cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old")
+    cursor.execute(f"DROP TABLE {table}_old")
+
+
+def _add_channel_avatar_columns(cursor):
+    """Add the cached avatar URL columns to channels."""
+    _add_column_if_missing(cursor, 'channels', 'avatar_url', 'TEXT')
+    _add_column_if_missing(cursor, 'channels', 'avatar_fetched_at', 'INTEGER')
+
+
+def _add_column_if_missing(cursor, table, column, declaration):
+    """Add a column to a table unless it is already there."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        logger.info(f"Adding column {table}.{column}")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def _add_subscription_enriched_at_column(cursor):
+    """Add the column recording when a subscription was last enriched."""
+    _add_column_if_missing(cursor, 'subscriptions', 'enriched_at', 'INTEGER')
+
+
+# Ordered (version, migration) pairs; each runs once when user_version is below its version
+_SCHEMA_MIGRATIONS = [
+    (1, _drop_expected_filename_column),
+    (2, _add_updated_at_defaults),
+    (3, _add_channel_avatar_columns),
+    (4, _add_subscription_enriched_at_column),
+]
+
+
+def _apply_schema_migrations(conn):
+    """Run pending schema migrations based on PRAGMA user_version."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    current_version = cursor.fetchone()[0]
+
+    for version, migration in _SCHEMA_MIGRATIONS:
+        if current_version < version:
+            logger.info(f"Applying schema migration {version}")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+
+
+def _set_schema_version(version):
+    """Stamp a freshly created database with the current schema version."""
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _ensure_timestamp_triggers():
+    """Create the triggers that keep updated_at current on every row update."""
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        for table in ('config', 'subscriptions'):
+            key = 'key' if table == 'config' else 'id'
+            # Recreated each start so databases with an older trigger body pick up the local time
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_updated")
+            conn.execute(f'''
+                CREATE TRIGGER trg_{table}_updated
+                AFTER UPDATE ON {table}
+                FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+                BEGIN
+                    UPDATE {table} SET updated_at = {LOCAL_NOW_SQL} WHERE {key} = NEW.{key};
+                END
+            ''')
+        conn.commit()
+    finally:
+        conn.close()
+
+
 def get_db():
     """Get the database instance."""
     return db
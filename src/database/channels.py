@@ -1,5 +1,7 @@
+import time
 from datetime import datetime
-from pony.orm import PrimaryKey, Required, Set, db_session, desc, select
+from pony.orm import (PrimaryKey, Optional, Required, Set, TransactionIntegrityError, db_session, desc,
+                      flush, rollback, select)
 from database.base import db
 from util import logger
 
@@ -13,6 +15,10 @@ class Channel(db.Entity):
     name = Required(str)
     created_at = Required(datetime, default=lambda: datetime.now())
 
+    # Last resolved avatar URL, so thumbnails can be re-fetched without asking yt-dlp again
+    avatar_url = Optional(str, nullable=True)
+    avatar_fetched_at = Optional(int)  # Unix timestamp
+
     # Relationships
     videos = Set('Video')
     subscriptions = Set('Subscription')
@@ -25,6 +31,8 @@ def _channel_to_dict(channel):
         "channel_id": channel.channel_id,
         "name": channel.name,
         "created_at": channel.created_at.isoformat(),
+        "avatar_url": channel.avatar_url,
+        "avatar_fetched_at": channel.avatar_fetched_at,
         "video_count": len(channel.videos),
         "subscription_count": len(channel.subscriptions)
     }
@@ -40,13 +48,20 @@ def get_all_channels():
 def add_channel(channel_id, name):
     """Add a channel to the database."""
     try:
-        if not channel_exists(channel_id):
-            channel = Channel(channel_id=channel_id, name=name)
-            logger.info(f"Added channel: {name} ({channel_id})")
-            return _channel_to_dict(channel)
-        else:
+        existing = Channel.get(channel_id=channel_id)
+        if existing:
             logger.info(f"Channel already exists: {channel_id}")
-            return get_channel_by_id(channel_id)
+            return _channel_to_dict(existing)
+
+        channel = Channel(channel_id=channel_id, name=name)
+        flush()
+        logger.info(f"Added channel: {name} ({channel_id})")
+        return _channel_to_dict(channel)
+    except TransactionIntegrityError:
+        # Another thread inserted the same channel between the lookup and the insert
+        rollback()
+        logger.info(f"Channel already exists: {channel_id}")
+        return get_channel_by_id(channel_id)
     except Exception as e:
         logger.error(f"Error adding channel: {e}")
         return None
@@ -59,6 +74,28 @@ def get_channel_by_id(channel_id):
     return _channel_to_dict(channel) if channel else None
 
 
+@db_session
+def get_channel_avatar(channel_id):
+    """Get a channel's stored (avatar_url, avatar_fetched_at), or None if the channel is unknown."""
+    # Selects the two columns only; _channel_to_dict would load every video of the channel
+    return select((c.avatar_url, c.avatar_fetched_at) for c in Channel if c.channel_id == channel_id).first()
+
+
+@db_session
+def set_channel_avatar(channel_id, avatar_url):
+    """Remember the resolved avatar URL for a channel."""
+    try:
+        channel = Channel.get(channel_id=channel_id)
+        if channel:
+            channel.avatar_url = avatar_url
+            channel.avatar_fetched_at = int(time.time())
+            return True
+        return False
+    except Exception as e:
+        logger.error(f"Error setting channel avatar: {e}")
+        return False
+
+
 @db_session
 def channel_exists(channel_id):
     """Check if a channel exists by channel ID."""
@@ -1,6 +1,7 @@
+import time
 from datetime import datetime
 from pony.orm import PrimaryKey, Optional, Required, db_session
-from database.base import db
+from database.base import db, LOCAL_NOW_SQL
 from util import logger
 
 
@@ -9,7 +10,8 @@ class Config(db.Entity):
     _table_ = 'config'
     key = PrimaryKey(str)
     value = Optional(str)
-    updated_at = Required(datetime, default=lambda: datetime.now())
+    # Maintained by SQLite (column default + update trigger)
+    updated_at = Required(datetime, sql_default=f'({LOCAL_NOW_SQL})', optimistic=False)
 
 # Default yt-dlp parameters
 DEFAULT_PARAMETERS = ('-f "bv[vcodec^=av01][height<=1080]+ba/bv[ext=mp4][height<=1080]+ba/b[height<=1080]" '
@@ -28,6 +30,10 @@ DEFAULT_PARAMETERS = ('-f "bv[vcodec^=av01][height<=1080]+ba/bv[ext=mp4][height<
                      +'--convert-thumbnail jpg '
                      +'-P "data"')
 
+# get_parameters() result reused briefly across callers: (value, loaded_at); cleared on writes
+_PARAMETERS_TTL = 5
+_parameters_cache = None
+
 
 def init_default_config():
     """Initialize default configuration values."""
@@ -48,27 +54,45 @@ def get_config():
     }
 
 
-@db_session
 def get_parameters():
-    """Get the current parameters from config."""
+    """Get the current parameters from config (cached for a few seconds)."""
+    global _parameters_cache
+    cached = _parameters_cache
+    if cached and time.monotonic() - cached[1] < _PARAMETERS_TTL:
+        return cached[0]
+
+    parameters = _load_parameters()
+    _parameters_cache = (parameters, time.monotonic())
+    return parameters
+
+
+@db_session
+def _load_parameters():
     config = Config.get(key='parameters')
     return config.value if config else ""
 
 
-@db_session
+def _invalidate_parameters():
+    global _parameters_cache
+    _parameters_cache = None
+
+
 def set_parameters(parameters):
     """Set parameters in the database."""
     try:
-        config = Config.get(key='parameters')
-        if config:
-            config.value = parameters
-            config.updated_at = datetime.now()
-        else:
-            Config(key='parameters', value=parameters)
+        with db_session:
+            config = Config.get(key='parameters')
+            if config:
+                config.value = parameters
+            else:
+                Config(key='parameters', value=parameters)
         return True
     except Exception as e:
         logger.error(f"Error setting parameters: {e}")
         return False
+    finally:
+        # After the commit, so a concurrent get_parameters() can't re-cache the old value
+        _invalidate_parameters()
 
 
 @db_session
@@ -78,17 +102,19 @@ def get_config_value(key, default=None):
     return config.value if config else default
 
 
-@db_session
 def set_config_value(key, value):
     """Set a specific config value."""
     try:
-        config = Config.get(key=key)
-        if config:
-            config.value = value
-            config.updated_at = datetime.now()
-        else:
-            Config(key=key, value=value)
+        with db_session:
+            config = Config.get(key=key)
+            if config:
+                config.value = value
+            else:
+                Config(key=key, value=value)
         return True
     except Exception as e:
         logger.error(f"Error setting config value: {e}")
-        return False
\ No newline at end of file
+        return False
+    finally:
+        if key == 'parameters':
+            _invalidate_parameters()
\ No newline at end of file
@@ -1,6 +1,6 @@
 from datetime import datetime
 from pony.orm import *
-from database.base import db
+from database.base import db, LOCAL_NOW_SQL
 from util import logger
 
 
@@ -11,7 +11,10 @@ class Subscription(db.Entity):
     url = Required(str, unique=True)
     subscription_type = Optional(str, column='type')  # video, playlist, or channel
     created_at = Required(datetime, default=lambda: datetime.now())
-    updated_at = Required(datetime, default=lambda: datetime.now())
+    # Maintained by SQLite (column default + update trigger)
+    updated_at = Required(datetime, sql_default=f'({LOCAL_NOW_SQL})', optimistic=False)
+    # Last successful enrichment, so periodic refreshes can skip fresh subscriptions
+    enriched_at = Optional(int)  # Unix timestamp
 
     # Foreign key to channel (when discovered)
     channel = Optional('Channel')
@@ -23,7 +26,8 @@ def _subscription_to_dict(subscription):
         "url": subscription.url,
         "type": subscription.subscription_type or "",
         "channel": subscription.channel.name if subscription.channel else "",
-        "channel_id": subscription.channel.channel_id if subscription.channel else ""
+        "channel_id": subscription.channel.channel_id if subscription.channel else "",
+        "enriched_at": subscription.enriched_at
     }
 
 
@@ -85,7 +89,8 @@ def update_subscription(subscription_data):
         subscription = Subscription.get(url=subscription_data["url"])
         if subscription:
             subscription.subscription_type = subscription_data.get("type", subscription.subscription_type)
-            subscription.updated_at = datetime.now()
+            if subscription_data.get("enriched_at"):
+                subscription.enriched_at = subscription_data["enriched_at"]
 
             # Update channel relationship if provided
             if subscription_data.get("channel_id"):
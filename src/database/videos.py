@@ -1,7 +1,10 @@
 import os
+import re
 import glob
+import functools
 from datetime import datetime
-from pony.orm import PrimaryKey, Required, Optional, db_session, desc, select
+from pony.orm import (PrimaryKey, Required, Optional, TransactionIntegrityError, db_session, desc, flush,
+                      rollback, select)
 from database.base import db
 from util import logger
 
@@ -20,9 +23,23 @@ class Video(db.Entity):
     channel = Optional('Channel')
 
 
-def _video_to_dict(video):
-    """Convert a Video entity to a dictionary."""
-    is_downloaded = check_video_downloaded(video.video_id)
+_FILESIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+_VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.avi', '.mov', '.flv', '.m4v')
+_BRACKETED_ID_PATTERN = re.compile(r"\[([^\[\]]+)\]")
+_IN_QUERY_CHUNK = 900
+
+
+def _video_to_dict(video, downloaded_ids=None):
+    """
+    Convert a Video entity to a dictionary.
+
+    When downloaded_ids (from scan_downloaded_video_ids) is given, the download
+    check is a set lookup instead of a filesystem scan per video.
+    """
+    if downloaded_ids is not None:
+        is_downloaded = video.video_id in downloaded_ids
+    else:
+        is_downloaded = check_video_downloaded(video.video_id)
 
     return {
         "id": video.id,
@@ -37,10 +54,17 @@ def _video_to_dict(video):
     }
 
 
-@db_session
 def get_all_videos():
     """Get all videos from database."""
-    return [_video_to_dict(video) for video in select(v for v in Video).order_by(desc(Video.created_at))]
+    return list(iter_all_videos())
+
+
+@db_session
+def iter_all_videos():
+    """Yield all videos from database one dictionary at a time, newest first."""
+    downloaded_ids = scan_downloaded_video_ids()
+    for video in select(v for v in Video).order_by(desc(Video.created_at)).prefetch(Video.channel):
+        yield _video_to_dict(video, downloaded_ids)
 
 
 @db_session
@@ -49,7 +73,8 @@ def get_videos_by_channel(channel_id):
     from database.channels import Channel
     channel = Channel.get(channel_id=channel_id)
     if channel:
-        return [_video_to_dict(video) for video in
+        downloaded_ids = scan_downloaded_video_ids()
+        return [_video_to_dict(video, downloaded_ids) for video in
                 select(v for v in Video if v.channel == channel).order_by(desc(Video.created_at))]
     return []
 
@@ -62,23 +87,24 @@ def get_channel_video_stats(channel_id):
     if not channel:
         return None
 
-    videos = list(select(v for v in Video if v.channel == channel))
+    # Plain rows instead of entities keep the session cache from growing with the channel size
+    channel_db_id = channel.id
+    rows = db.select("SELECT video_id, filesize FROM videos WHERE channel = $channel_db_id")
+    downloaded_ids = scan_downloaded_video_ids()
 
-    total_count = len(videos)
+    total_count = len(rows)
     downloaded_count = 0
     downloaded_size = 0
     total_size = 0
 
-    for video in videos:
-        is_downloaded = check_video_downloaded(video.video_id)
-
-        if is_downloaded:
+    for video_id, filesize in rows:
+        if video_id in downloaded_ids:
             downloaded_count += 1
-            if video.filesize:
-                downloaded_size += video.filesize
+            if filesize:
+                downloaded_size += filesize
 
-        if video.filesize:
-            total_size += video.filesize
+        if filesize:
+            total_size += filesize
 
     return {
         "total_count": total_count,
@@ -95,30 +121,79 @@ def get_channel_video_stats(channel_id):
 def add_video(video_id, title, channel_id=None, filesize=None):
     """Add a video to the database."""
     try:
-        if not video_exists(video_id):
-            from database.channels import Channel
-
-            # Get channel if provided
-            channel = None
-            if channel_id:
-                channel = Channel.get(channel_id=channel_id)
-
-            video = Video(
-                video_id=video_id,
-                title=title,
-                filesize=filesize,
-                channel=channel
-            )
-            logger.info(f"Added video: {title} ({video_id}) - {format_filesize(filesize) if filesize else 'unknown size'}")
-            return _video_to_dict(video)
-        else:
+        existing = Video.get(video_id=video_id)
+        if existing:
             logger.info(f"Video already exists: {video_id}")
-            return get_video_by_id(video_id)
+            return _video_to_dict(existing)
+
+        from database.channels import Channel
+
+        # Get channel if provided
+        channel = None
+        if channel_id:
+            channel = Channel.get(channel_id=channel_id)
+
+        video = Video(
+            video_id=video_id,
+            title=title,
+            filesize=filesize,
+            channel=channel
+        )
+        flush()
+        logger.info(f"Added video: {title} ({video_id}) - {format_filesize(filesize) if filesize else 'unknown size'}")
+        return _video_to_dict(video)
+    except TransactionIntegrityError:
+        # Another thread inserted the same video between the lookup and the insert
+        rollback()
+        logger.info(f"Video already exists: {video_id}")
+        return get_video_by_id(video_id)
     except Exception as e:
         logger.error(f"Error adding video: {e}")
         return None
 
 
+@db_session
+def add_videos(videos, channel_id=None):
+    """
+    Add several videos of one channel in a single transaction.
+
+    Args:
+        videos: List of (video_id, title, filesize) tuples
+        channel_id: YouTube channel ID the videos belong to
+
+    Returns:
+        Number of videos inserted; IDs already in the database are skipped
+    """
+    from database.channels import Channel
+
+    channel = Channel.get(channel_id=channel_id) if channel_id else None
+    video_ids = [video_id for video_id, _, _ in videos]
+
+    # A concurrent enrichment may insert some of the same videos; retry against the fresh state
+    for _ in range(3):
+        existing = existing_video_ids(video_ids)
+        added = 0
+        for video_id, title, filesize in videos:
+            if video_id in existing:
+                continue
+            existing.add(video_id)
+            Video(video_id=video_id, title=title, filesize=filesize, channel=channel)
+            added += 1
+
+        try:
+            flush()
+        except TransactionIntegrityError:
+            rollback()
+            channel = Channel.get(channel_id=channel_id) if channel_id else None
+            continue
+
+        logger.info(f"Added {added} of {len(videos)} videos for channel {channel_id}")
+        return added
+
+    logger.error(f"Could not add {len(videos)} videos for channel {channel_id}")
+    return 0
+
+
 @db_session
 def update_video_filesize(video_id, filesize):
     """Update the filesize for an existing video."""
@@ -147,6 +222,47 @@ def video_exists(video_id):
     return Video.exists(video_id=video_id)
 
 
+@db_session
+def existing_video_ids(video_ids) -> set:
+    """
+    Return which of the given video IDs are already in the database.
+
+    Args:
+        video_ids: YouTube video IDs to check
+
+    Returns:
+        Set of the IDs that exist
+    """
+    video_ids = list(video_ids)
+    existing = set()
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(video_ids), _IN_QUERY_CHUNK):
+        chunk = video_ids[start:start + _IN_QUERY_CHUNK]
+        existing.update(select(v.video_id for v in Video if v.video_id in chunk))
+    return existing
+
+
+def scan_downloaded_video_ids(data_dir: str = "data") -> set:
+    """
+    Walk the data directory once and collect the IDs of all downloaded videos.
+
+    Video files are recognised the same way as in check_video_downloaded: a video
+    extension and the ID in square brackets somewhere in the filename.
+
+    Args:
+        data_dir: Directory to search in (default: "data")
+
+    Returns:
+        Set of video IDs that have a file on disk
+    """
+    downloaded_ids = set()
+    for _, _, filenames in os.walk(data_dir):
+        for filename in filenames:
+            if filename.lower().endswith(_VIDEO_EXTENSIONS):
+                downloaded_ids.update(_BRACKETED_ID_PATTERN.findall(filename))
+    return downloaded_ids
+
+
 def check_video_downloaded(video_id: str, data_dir: str = "data") -> bool:
     """
     Check if video file exists on disk by scanning for files containing [video_id].
@@ -169,13 +285,11 @@ def check_video_downloaded(video_id: str, data_dir: str = "data") -> bool:
     matches = glob.glob(pattern, recursive=True)
 
     # Filter matches to only include video files with [video_id] in the name
-    video_extensions = ['.mp4', '.mkv', '.webm', '.avi', '.mov', '.flv', '.m4v']
     target_pattern = f"[{video_id}]"
 
     for match in matches:
         # Check if it's a video file and contains [video_id]
-        if (any(match.lower().endswith(ext) for ext in video_extensions) and
-            target_pattern in match):
+        if match.lower().endswith(_VIDEO_EXTENSIONS) and target_pattern in match:
             return True
 
     return False
@@ -200,29 +314,25 @@ def find_video_file_path(video_id: str, data_dir: str = "data"):
     matches = glob.glob(pattern, recursive=True)
 
     # Filter matches to only include video files with [video_id] in the name
-    video_extensions = ['.mp4', '.mkv', '.webm', '.avi', '.mov', '.flv', '.m4v']
     target_pattern = f"[{video_id}]"
 
     for match in matches:
         # Check if it's a video file and contains [video_id]
-        if (any(match.lower().endswith(ext) for ext in video_extensions) and
-            target_pattern in match):
+        if match.lower().endswith(_VIDEO_EXTENSIONS) and target_pattern in match:
             return os.path.relpath(match)
 
     return None
 
 
+@functools.lru_cache(maxsize=4096)
 def format_filesize(size_bytes):
     """Convert bytes to human-readable format."""
-    if size_bytes is None or size_bytes == 0:
+    if not size_bytes:
         return "0 B"
 
     size_bytes = int(size_bytes)
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size_bytes < 1024.0:
-            if unit == 'B':
-                return f"{size_bytes} {unit}"
-            else:
-                return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.1f} PB"
\ No newline at end of file
+    # Each unit step is a factor of 1024 (10 bits), so the unit index falls out of the bit length
+    unit_index = min((size_bytes.bit_length() - 1) // 10, len(_FILESIZE_UNITS) - 1)
+    if unit_index <= 0:
+        return f"{size_bytes} B"
+    return f"{size_bytes / (1 << (unit_index * 10)):.1f} {_FILESIZE_UNITS[unit_index]}"
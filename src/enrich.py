@@ -18,18 +18,34 @@ subscription_service = SubscriptionService(
 )
 
 
-def enrich_subscription(subscription):
+def enrich_subscription(subscription, force=False):
     """
     Main enrichment function - now delegates to SubscriptionService.
     Maintains backward compatibility with existing code.
 
     Args:
         subscription: Dictionary containing subscription data
+        force: Enrich even if the subscription was enriched recently
 
     Returns:
         True if enrichment succeeded, False otherwise
     """
-    return subscription_service.enrich_subscription(subscription)
+    return subscription_service.enrich_subscription(subscription, force)
+
+
+def enrich_subscriptions(subscriptions, max_workers=8, force=False):
+    """
+    Enrich several subscriptions concurrently - delegates to SubscriptionService.
+
+    Args:
+        subscriptions: List of subscription dictionaries
+        max_workers: Maximum number of concurrent enrichments
+        force: Also re-enrich subscriptions that were enriched recently
+
+    Returns:
+        List of True/False results, one per subscription
+    """
+    return subscription_service.enrich_subscriptions(subscriptions, max_workers, force)
 
 
 def populate_videos_from_channel(channel_id, limit=50):
@@ -47,6 +63,11 @@ def populate_videos_from_channel(channel_id, limit=50):
     return video_discovery_service.populate_videos_from_channel(channel_id, limit)
 
 
+def clear_metadata_cache():
+    """Drop all cached yt-dlp metadata so the next lookups hit YouTube again."""
+    metadata_service.clear_cache()
+
+
 # Legacy function aliases for backward compatibility
 def get_ytdlp_info(url):
     """Legacy alias for fetch_url_metadata."""
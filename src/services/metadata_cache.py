@@ -0,0 +1,209 @@
+"""
+Metadata Cache - Memoization of yt-dlp lookups.
+Identical requests made close together (re-enrichment, UI refreshes) share one yt-dlp run,
+and results persisted on disk survive container restarts.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from util import logger, json_loads, json_dumps
+
+
+class MetadataCache:
+    """
+    Thread-safe TTL + LRU cache that also collapses concurrent misses for the same key.
+
+    Values can be whole flat-playlist dumps of several MB, so expired entries are
+    dropped as soon as they are seen and the entry count is kept small.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 32):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        Return the cached value for key, or call fetch once to produce it.
+
+        Callers asking for a key that is already being fetched wait for that
+        fetch instead of starting their own. None results are not cached, so a
+        failed lookup is retried by the next caller.
+
+        Args:
+            key: Cache key (URL or ID)
+            fetch: Function producing the value on a miss
+
+        Returns:
+            The cached or freshly fetched value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                if time.monotonic() - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            if value is not None:
+                now = time.monotonic()
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+                self._evict(now)
+        future.set_result(value)
+        return value
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones beyond max_entries (lock held)."""
+        for key in [key for key, (stored_at, _) in self._entries.items() if now - stored_at >= self.ttl]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached values; fetches in progress are unaffected."""
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache:
+    """
+    JSON cache stored as one file per key under cache_dir, sharded by hash prefix.
+
+    Files are written to a unique temporary name and renamed into place, so
+    concurrent writers (threads or processes) never expose a partial entry.
+    Deleting cache_dir invalidates everything.
+    """
+
+    def __init__(self, cache_dir: str, max_age: float):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        # Shard directories known to exist, so writes skip makedirs' stat of every ancestor
+        self._shard_dirs = set()
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest[2:]}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Read the value stored for key.
+
+        Args:
+            key: Cache key (URL or ID)
+
+        Returns:
+            The stored value, or None if missing, expired or unreadable
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable metadata cache entry for {key}: {e}")
+            return None
+
+        if time.time() - entry.get("ts", 0) > self.max_age:
+            # Expired entries are deleted rather than left for the next put to overwrite
+            self._remove(key)
+            return None
+        return entry.get("data")
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not delete expired metadata cache entry for {key}: {e}")
+
+    def put(self, key: str, data: Any) -> None:
+        """
+        Store data for key, replacing any previous entry.
+
+        Args:
+            key: Cache key (URL or ID)
+            data: JSON-serializable value
+        """
+        path = self._path(key)
+        shard_dir = os.path.dirname(path)
+        try:
+            if shard_dir not in self._shard_dirs:
+                os.makedirs(shard_dir, exist_ok=True)
+                self._shard_dirs.add(shard_dir)
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=shard_dir, suffix=".tmp")
+            except FileNotFoundError:
+                # cache_dir was deleted to invalidate the cache; recreate the shard once
+                self._shard_dirs.discard(shard_dir)
+                os.makedirs(shard_dir, exist_ok=True)
+                self._shard_dirs.add(shard_dir)
+                fd, tmp_path = tempfile.mkstemp(dir=shard_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(json_dumps({"ts": time.time(), "data": data}))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            logger.warning(f"Could not write metadata cache entry for {key}: {e}")
+
+    def prune(self) -> int:
+        """
+        Delete entries (and stray temporary files) older than max_age.
+
+        Entries that are never looked up again are only removed here. The
+        file modification time is the write time, so no entry has to be read.
+
+        Returns:
+            Number of files deleted
+        """
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not prune metadata cache file {path}: {e}")
+        if removed:
+            logger.info(f"Pruned {removed} expired metadata cache entries")
+        return removed
+
+    def clear(self) -> None:
+        """Delete every stored entry."""
+        self._shard_dirs.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
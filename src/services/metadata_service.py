@@ -3,15 +3,71 @@ Metadata Service - Simplified without filename generation complexity.
 """
 import subprocess
 import json
-from typing import Dict, Optional, List
-from util import logger, YTDLP_BINARY
+import os
+import threading
+from itertools import islice
+from typing import Dict, Iterator, Optional, List
+from util import logger, YTDLP_BINARY, SUBPROCESS_CLOSE_FDS, METADATA_CACHE_MAX_AGE, json_loads
+from . import ytdlp_api
+from .metadata_cache import DiskCache, MetadataCache
+
+# Fixed argv prefixes and URL builders for the yt-dlp calls below
+_FLAT_PLAYLIST_JSON_ARGV = (YTDLP_BINARY, "--flat-playlist", "-J")
+_JSON_ARGV = (YTDLP_BINARY, "-J")
+_FILESIZE_ARGV = (YTDLP_BINARY, "--print", "%(filesize,filesize_approx)s")
+_SUMMARY_ARGV = (YTDLP_BINARY, "--ignore-errors", "--no-warnings",
+                 "--print", "%(id)s\t%(filesize,filesize_approx)s\t%(title)s")
+# Only the fields get_video_metadata_with_filesize reads, instead of the full -J dump with every format
+_VIDEO_BUNDLE_ARGV = (YTDLP_BINARY, "--print", "%(.{id,title,uploader,channel_id,duration,upload_date,"
+                                               "filesize,filesize_approx,requested_formats})j")
+_CHANNEL_LIST_ARGV = (YTDLP_BINARY, "--flat-playlist", "--print", "%(id)s\t%(title)s")
+_WATCH_URL = "https://www.youtube.com/watch?v={}".format
+_CHANNEL_VIDEOS_URL = "https://www.youtube.com/channel/{}/videos".format
+
+# Subscription type by (_type, produced by a channel extractor)
+_CHANNEL_EXTRACTORS = frozenset({"YoutubeTab", "YoutubeChannel"})
+_TYPE_DISPATCH = {
+    ("playlist", True): "channel",
+    ("playlist", False): "playlist",
+    ("video", True): "video",
+    ("video", False): "video",
+    ("channel", True): "channel",
+    ("channel", False): "channel",
+    ("url_transparent", True): "channel",
+    ("url_transparent", False): "channel",
+}
+
+# Fallback when _type is missing or unrecognised
+_EXTRACTOR_TYPES = {
+    "youtube": "video",
+    "youtube:playlist": "playlist",
+    "youtube:channel": "channel",
+    "youtube:user": "channel",
+    "youtube:tab": "channel"
+}
 
 
 class MetadataService:
     """Service for fetching and parsing ytdlp metadata."""
 
-    def __init__(self, timeout: int = 30):
+    def __init__(self, timeout: int = 30, max_concurrent: int = 16,
+                 cache_dir: str = os.path.join("config", "cache", "metadata")):
         self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        # Shared by every thread using this service, so concurrent enrichments and
+        # discovery batches together never run more than max_concurrent yt-dlp processes
+        self._process_slots = threading.BoundedSemaphore(max_concurrent)
+        # URL metadata is re-requested within seconds by re-enrichment and UI flows
+        self._url_cache = MetadataCache(ttl=60)
+        # Second tier that survives restarts, so boot-time enrichment skips yt-dlp on hits
+        self._disk_cache = DiskCache(cache_dir, max_age=METADATA_CACHE_MAX_AGE)
+        # Drop entries left over from earlier runs without delaying startup
+        threading.Thread(target=self._disk_cache.prune, name="metadata-cache-prune", daemon=True).start()
+
+    def _run(self, cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+        """subprocess.run that waits for a free process slot first; a timed-out process is killed by run()."""
+        with self._process_slots:
+            return subprocess.run(cmd, **kwargs)
 
     def fetch_url_metadata(self, url: str) -> Optional[Dict]:
         """
@@ -23,24 +79,49 @@ class MetadataService:
         Returns:
             Dict containing metadata or None if failed
         """
+        return self._url_cache.get_or_fetch(url, lambda: self._fetch_url_metadata_via_disk(url))
+
+    def _fetch_url_metadata_via_disk(self, url: str) -> Optional[Dict]:
+        """fetch_url_metadata behind the on-disk cache only."""
+        data = self._disk_cache.get(url)
+        if data is None:
+            data = self._fetch_url_metadata(url)
+            if data is not None:
+                self._disk_cache.put(url, data)
+        return data
+
+    def clear_cache(self) -> None:
+        """Forget all cached URL metadata, in memory and on disk."""
+        self._url_cache.clear()
+        self._disk_cache.clear()
+
+    def _fetch_url_metadata(self, url: str) -> Optional[Dict]:
+        """Uncached fetch_url_metadata."""
+        if ytdlp_api.IN_PROCESS:
+            try:
+                return ytdlp_api.extract_info(url, flat=True, timeout=self.timeout)
+            except Exception as e:
+                logger.error("yt-dlp failed for %s: %s", url, e)
+                return None
+
         try:
-            result = subprocess.run(
-                [YTDLP_BINARY, "--flat-playlist", "-J", url],
+            result = self._run(
+                [*_FLAT_PLAYLIST_JSON_ARGV, url],
                 capture_output=True,
-                text=True,
                 check=True,
+                close_fds=SUBPROCESS_CLOSE_FDS,
                 timeout=self.timeout
             )
-            return json.loads(result.stdout)
+            return json_loads(result.stdout)
 
         except subprocess.TimeoutExpired:
-            logger.error(f"Timeout getting info for {url}")
+            logger.error("Timeout getting info for %s", url)
         except subprocess.CalledProcessError as e:
-            logger.error(f"yt-dlp failed for {url}: {e.stderr}")
+            logger.error("yt-dlp failed for %s: %s", url, e.stderr.decode(errors='replace'))
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from yt-dlp for {url}: {e}")
+            logger.error("Failed to parse JSON from yt-dlp for %s: %s", url, e)
         except Exception as e:
-            logger.error(f"Unexpected error getting info for {url}: {e}")
+            logger.error("Unexpected error getting info for %s: %s", url, e)
 
         return None
 
@@ -54,11 +135,19 @@ class MetadataService:
         Returns:
             Filesize in bytes or None if failed/unavailable
         """
+        if ytdlp_api.IN_PROCESS:
+            try:
+                info = ytdlp_api.extract_info(_WATCH_URL(video_id),
+                                                flat=False, timeout=self.timeout)
+            except Exception as e:
+                logger.warning("Unexpected error getting filesize for %s: %s", video_id, e)
+                return None
+            return self._filesize_from_info(info)
+
         try:
-            result = subprocess.run([
-                YTDLP_BINARY, "--print", "%(filesize,filesize_approx)s",
-                f"https://www.youtube.com/watch?v={video_id}"
-            ], capture_output=True, text=True, check=True, timeout=self.timeout)
+            result = self._run([
+                *_FILESIZE_ARGV, _WATCH_URL(video_id)
+            ], capture_output=True, text=True, check=True, close_fds=SUBPROCESS_CLOSE_FDS, timeout=self.timeout)
 
             if result.returncode == 0:
                 filesize_str = result.stdout.strip()
@@ -69,23 +158,71 @@ class MetadataService:
                         # Try to parse as integer (bytes)
                         filesize = int(float(filesize_str))
                         if filesize > 0:
-                            logger.debug(f"Got filesize for {video_id}: {filesize} bytes")
+                            logger.debug("Got filesize for %s: %s bytes", video_id, filesize)
                             return filesize
                     except (ValueError, TypeError):
-                        logger.debug(f"Could not parse filesize '{filesize_str}' for {video_id}")
+                        logger.debug("Could not parse filesize '%s' for %s", filesize_str, video_id)
 
-                logger.debug(f"No valid filesize available for {video_id}")
+                logger.debug("No valid filesize available for %s", video_id)
                 return None
 
         except subprocess.TimeoutExpired:
-            logger.warning(f"Timeout getting filesize for {video_id}")
+            logger.warning("Timeout getting filesize for %s", video_id)
         except subprocess.CalledProcessError as e:
-            logger.warning(f"yt-dlp failed to get filesize for {video_id}: {e.stderr}")
+            logger.warning("yt-dlp failed to get filesize for %s: %s", video_id, e.stderr)
         except Exception as e:
-            logger.warning(f"Unexpected error getting filesize for {video_id}: {e}")
+            logger.warning("Unexpected error getting filesize for %s: %s", video_id, e)
 
         return None
 
+    def fetch_video_summaries(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch title and filesize for several videos with a single yt-dlp invocation.
+
+        Args:
+            video_ids: YouTube video IDs
+
+        Returns:
+            Dict mapping video ID to {"id", "title", "filesize"}; videos that failed are missing
+        """
+        if not video_ids:
+            return {}
+
+        try:
+            result = self._run([
+                *_SUMMARY_ARGV, *map(_WATCH_URL, video_ids)
+            ], capture_output=True, text=True, close_fds=SUBPROCESS_CLOSE_FDS,
+                timeout=self.timeout * len(video_ids))
+        except subprocess.TimeoutExpired:
+            logger.warning("Timeout getting info for %s videos", len(video_ids))
+            return {}
+        except Exception as e:
+            logger.warning("Unexpected error getting info for %s videos: %s", len(video_ids), e)
+            return {}
+
+        if result.returncode != 0:
+            logger.warning("yt-dlp reported errors for some of %s videos: %s", len(video_ids), result.stderr.strip())
+
+        summaries = {}
+        for line in result.stdout.splitlines():
+            parts = line.split("\t", 2)
+            if len(parts) != 3:
+                continue
+
+            video_id, filesize_str, title = parts
+            try:
+                filesize = int(float(filesize_str))
+            except ValueError:
+                filesize = None
+
+            summaries[video_id] = {
+                "id": video_id,
+                "title": title,
+                "filesize": filesize if filesize and filesize > 0 else None
+            }
+
+        return summaries
+
     def get_video_metadata_with_filesize(self, video_id: str) -> Dict:
         """
         Get comprehensive metadata for a video including filesize.
@@ -96,19 +233,17 @@ class MetadataService:
         Returns:
             Dict with metadata including filesize
         """
-        # Get detailed metadata
-        detailed_data = self.fetch_detailed_video_info(video_id)
-
-        # Get filesize separately (more reliable than JSON metadata)
-        filesize = self.get_video_filesize(video_id)
+        # One yt-dlp run provides both the metadata and the format sizes
+        detailed_data = self.fetch_video_bundle(video_id)
 
         result = {
             "video_id": video_id,
-            "filesize": filesize
+            "filesize": None
         }
 
         if detailed_data:
             result.update({
+                "filesize": self._filesize_from_info(detailed_data),
                 "title": detailed_data.get("title", "Unknown Title"),
                 "uploader": detailed_data.get("uploader", "Unknown"),
                 "channel_id": detailed_data.get("channel_id", ""),
@@ -118,6 +253,30 @@ class MetadataService:
 
         return result
 
+    @staticmethod
+    def _filesize_from_info(data: Dict) -> Optional[int]:
+        """
+        Pick the download size from a full yt-dlp info dict.
+
+        Args:
+            data: Metadata dictionary from `yt-dlp -J`
+
+        Returns:
+            Size in bytes of the selected format(s), or None if unknown
+        """
+        filesize = data.get("filesize") or data.get("filesize_approx")
+
+        # Merged downloads (video+audio) report their parts in requested_formats
+        if not filesize:
+            filesize = sum(f.get("filesize") or f.get("filesize_approx") or 0
+                           for f in data.get("requested_formats") or ())
+
+        if not filesize:
+            filesize = max((f.get("filesize") or f.get("filesize_approx") or 0
+                            for f in data.get("formats") or ()), default=0)
+
+        return int(filesize) if filesize and filesize > 0 else None
+
     def determine_subscription_type(self, data: Dict) -> str:
         """
         Determine if URL is a video, playlist, or channel based on JSON data.
@@ -130,28 +289,12 @@ class MetadataService:
         """
         entry_type = data.get("_type", "")
         extractor = data.get("extractor", "")
-        extractor_key = data.get("extractor_key", "")
-
-        logger.info(f'Found _type: {entry_type}, extractor: {extractor}')
-
-        # Check the _type field first
-        if entry_type == "playlist":
-            return "channel" if extractor_key in ("YoutubeTab", "YoutubeChannel") else "playlist"
-        elif entry_type == "video":
-            return "video"
-        elif entry_type in ("channel", "url_transparent"):
-            return "channel"
-
-        # Fallback to extractor
-        type_mapping = {
-            "youtube": "video",
-            "youtube:playlist": "playlist",
-            "youtube:channel": "channel",
-            "youtube:user": "channel",
-            "youtube:tab": "channel"
-        }
 
-        return type_mapping.get(extractor, "unknown")
+        logger.info('Found _type: %s, extractor: %s', entry_type, extractor)
+
+        # Decide on _type (plus whether a channel extractor produced it), falling back to the extractor
+        subscription_type = _TYPE_DISPATCH.get((entry_type, data.get("extractor_key") in _CHANNEL_EXTRACTORS))
+        return subscription_type or _EXTRACTOR_TYPES.get(extractor, "unknown")
 
     def extract_channel_info(self, data: Dict) -> Dict[str, str]:
         """
@@ -163,39 +306,116 @@ class MetadataService:
         Returns:
             Dict with 'channel' and 'channel_id' keys
         """
-        channel_name = data.get("channel", data.get("uploader", data.get("title", "Unknown Channel")))
-        channel_id = data.get("channel_id", data.get("uploader_id", ""))
+        # Short-circuit: later keys are only looked up when earlier ones are missing or empty
+        channel_name = data.get("channel") or data.get("uploader") or data.get("title") or "Unknown Channel"
+        channel_id = data.get("channel_id") or data.get("uploader_id") or ""
 
-        logger.info(f'Extracted channel info: {channel_name} ({channel_id})')
+        logger.info('Extracted channel info: %s (%s)', channel_name, channel_id)
 
         return {
             "channel": channel_name,
             "channel_id": channel_id
         }
 
-    def fetch_channel_video_list(self, channel_id: str, timeout: int = 60) -> List[Dict]:
+    def fetch_channel_video_list(self, channel_id: str, timeout: int = 60,
+                                 limit: Optional[int] = None) -> Iterator[Dict]:
         """
         Fetch the list of videos from a channel.
 
+        Entries are yielded as yt-dlp produces them, so callers can start working
+        (or stop early) before the whole channel has been listed.
+
         Args:
             channel_id: YouTube channel ID
             timeout: Request timeout in seconds
+            limit: Stop after this many entries, so yt-dlp doesn't page through the rest of the channel
+
+        Yields:
+            Video entry dictionaries (at least 'id' and 'title')
+        """
+        url = _CHANNEL_VIDEOS_URL(channel_id)
+
+        if ytdlp_api.IN_PROCESS:
+            entries = self._iter_channel_entries_in_process(channel_id, url, timeout)
+            try:
+                yield from islice(entries, limit)
+            finally:
+                # Closes the extractor once the limit is reached, not when the generator is collected
+                entries.close()
+            return
+
+        limit_argv = ("--playlist-end", str(limit)) if limit else ()
+
+        with self._process_slots:
+            try:
+                # stderr is merged into stdout so an unread pipe can't stall yt-dlp
+                proc = subprocess.Popen([
+                    *_CHANNEL_LIST_ARGV, *limit_argv, url
+                ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, close_fds=SUBPROCESS_CLOSE_FDS)
+            except Exception as e:
+                logger.error("Failed to fetch video list for channel %s: %s", channel_id, e)
+                return
+
+            watchdog = threading.Timer(timeout, proc.kill)
+            watchdog.start()
+            try:
+                for line in proc.stdout:
+                    video_id, sep, title = line.rstrip("\n").partition("\t")
+                    if sep:
+                        yield {"id": video_id, "title": title}
+                    elif line.strip():
+                        logger.warning("yt-dlp: %s", line.strip())
+            finally:
+                watchdog.cancel()
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+                proc.stdout.close()
+
+        if proc.returncode:
+            logger.error("yt-dlp exited with %s listing videos for channel %s", proc.returncode, channel_id)
+
+    @staticmethod
+    def _iter_channel_entries_in_process(channel_id: str, url: str, timeout: int) -> Iterator[Dict]:
+        """
+        Yield channel entries straight from the extractor's lazy entry generator.
+
+        Without processing, yt-dlp only requests further pages of the channel
+        listing as entries are consumed, so a caller that stops at its limit
+        never pays for (or holds in memory) the rest of the channel.
+        """
+        try:
+            with ytdlp_api.extract_info_unprocessed(url, timeout) as data:
+                for entry in data.get("entries") or ():
+                    if entry.get("id"):
+                        yield {"id": entry["id"], "title": entry.get("title")}
+        except Exception as e:
+            logger.error("Failed to fetch video list for channel %s: %s", channel_id, e)
+
+    def fetch_video_bundle(self, video_id: str) -> Optional[Dict]:
+        """
+        Fetch the metadata and filesize fields of a single video in one yt-dlp run.
+
+        Args:
+            video_id: YouTube video ID
 
         Returns:
-            List of video entry dictionaries
+            Dict with at least title, uploader, channel_id, duration, upload_date and the
+            filesize fields, or None if failed
         """
+        if ytdlp_api.IN_PROCESS:
+            return self.fetch_detailed_video_info(video_id)
+
         try:
-            result = subprocess.run([
-                YTDLP_BINARY, "--flat-playlist", "-J",
-                f"https://www.youtube.com/channel/{channel_id}/videos"
-            ], capture_output=True, text=True, check=True, timeout=timeout)
+            result = self._run([
+                *_VIDEO_BUNDLE_ARGV, _WATCH_URL(video_id)
+            ], capture_output=True, check=True, close_fds=SUBPROCESS_CLOSE_FDS, timeout=self.timeout)
 
-            data = json.loads(result.stdout)
-            return data.get("entries", [])
+            return json_loads(result.stdout)
 
         except Exception as e:
-            logger.error(f"Failed to fetch video list for channel {channel_id}: {e}")
-            return []
+            logger.warning("Failed to get detailed info for video %s: %s", video_id, e)
+            return None
 
     def fetch_detailed_video_info(self, video_id: str) -> Optional[Dict]:
         """
@@ -207,13 +427,21 @@ class MetadataService:
         Returns:
             Dict containing detailed video metadata or None if failed
         """
+        if ytdlp_api.IN_PROCESS:
+            try:
+                return ytdlp_api.extract_info(_WATCH_URL(video_id),
+                                                flat=False, timeout=self.timeout)
+            except Exception as e:
+                logger.warning("Failed to get detailed info for video %s: %s", video_id, e)
+                return None
+
         try:
-            result = subprocess.run([
-                YTDLP_BINARY, "-J", f"https://www.youtube.com/watch?v={video_id}"
-            ], capture_output=True, text=True, check=True, timeout=self.timeout)
+            result = self._run([
+                *_JSON_ARGV, _WATCH_URL(video_id)
+            ], capture_output=True, check=True, close_fds=SUBPROCESS_CLOSE_FDS, timeout=self.timeout)
 
-            return json.loads(result.stdout)
+            return json_loads(result.stdout)
 
         except Exception as e:
-            logger.warning(f"Failed to get detailed info for video {video_id}: {e}")
+            logger.warning("Failed to get detailed info for video %s: %s", video_id, e)
             return None
\ No newline at end of file
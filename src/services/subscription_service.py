@@ -1,10 +1,15 @@
 """
 Subscription Service - Enhanced with WebSocket progress reporting.
 """
-from typing import Dict
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
 from util import logger
 from database import add_channel, add_video
-from websocket_events import emit_subscription_event, emit_video_discovery_event
+from websocket_events import subscription_emitter
+
+# A subscription enriched less than this many seconds ago is not enriched again unless forced
+REFRESH_TTL = 3600
 
 
 class SubscriptionService:
@@ -14,45 +19,54 @@ class SubscriptionService:
         self.metadata_service = metadata_service
         self.thumbnail_service = thumbnail_service
         self.video_discovery_service = video_discovery_service
+        # Progress events are posted without blocking and sent from a background thread
+        self.emitter = subscription_emitter
+        # Thumbnail downloads overlap with video discovery instead of running before it
+        self._thumbnail_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnail")
 
-    def enrich_subscription(self, subscription: Dict) -> bool:
+    def enrich_subscription(self, subscription: Dict, force: bool = False) -> bool:
         """
         Main orchestration function - enriches a subscription with metadata.
 
         Args:
             subscription: Dictionary containing subscription data
+            force: Enrich even if the subscription was enriched within REFRESH_TTL
 
         Returns:
             True if enrichment succeeded, False otherwise
         """
         url = subscription["url"]
-        logger.info(f'Starting enrichment for subscription: {url}')
+        if not force and self._recently_enriched(subscription):
+            logger.info('Skipping recently enriched subscription: %s', url)
+            return True
+
+        logger.info('Starting enrichment for subscription: %s', url)
 
         # Step 1: Get metadata
-        emit_subscription_event("metadata_fetch", {
+        self.emitter.post("metadata_fetch", {
             "url": url,
             "message": "Fetching URL metadata..."
         })
 
         data = self.metadata_service.fetch_url_metadata(url)
         if not data:
-            logger.error(f"Could not get info for {url}")
-            emit_subscription_event("error", {
+            logger.error("Could not get info for %s", url)
+            self.emitter.post("error", {
                 "url": url,
                 "message": "Failed to fetch URL metadata"
             })
             return False
 
         # Step 2: Determine and set subscription type
-        emit_subscription_event("type_detection", {
+        self.emitter.post("type_detection", {
             "url": url,
             "message": "Determining subscription type..."
         })
 
         subscription_type = self.metadata_service.determine_subscription_type(data)
         if subscription_type == "unknown":
-            logger.error(f"Could not determine type for {url}")
-            emit_subscription_event("error", {
+            logger.error("Could not determine type for %s", url)
+            self.emitter.post("error", {
                 "url": url,
                 "message": "Could not determine subscription type"
             })
@@ -61,7 +75,7 @@ class SubscriptionService:
         subscription["type"] = subscription_type
 
         # Step 3: Extract and set channel information
-        emit_subscription_event("channel_info", {
+        self.emitter.post("channel_info", {
             "url": url,
             "message": "Extracting channel information..."
         })
@@ -70,15 +84,15 @@ class SubscriptionService:
         subscription.update(channel_info)
 
         # Step 4: Handle database operations for channel
-        emit_subscription_event("channel_setup", {
+        self.emitter.post("channel_setup", {
             "url": url,
             "message": f"Setting up channel: {subscription.get('channel', 'Unknown')}"
         })
 
-        self._handle_channel_operations(subscription)
+        thumbnail_future = self._handle_channel_operations(subscription)
 
         # *** KEY WEBSOCKET EVENT: Channel is ready, about to start video discovery ***
-        emit_subscription_event("channel_ready", {
+        self.emitter.post("channel_ready", {
             "url": url,
             "channel": subscription.get("channel", "Unknown"),
             "channel_id": subscription.get("channel_id", ""),
@@ -89,92 +103,141 @@ class SubscriptionService:
         # Step 5: Handle type-specific operations
         self._handle_type_specific_operations(subscription, data, subscription_type)
 
-        logger.info(f'Successfully enriched subscription {url} - type: {subscription_type}')
+        if thumbnail_future:
+            thumbnail_future.result()
+
+        # Persisted by update_subscription
+        subscription["enriched_at"] = int(time.time())
+        logger.info('Successfully enriched subscription %s - type: %s', url, subscription_type)
         return True
 
-    def _handle_channel_operations(self, subscription: Dict) -> None:
-        """Handle database operations and thumbnail download for the channel."""
+    @staticmethod
+    def _recently_enriched(subscription: Dict) -> bool:
+        """Whether the subscription was enriched within REFRESH_TTL (according to the database)."""
+        return bool(subscription.get("type") and subscription.get("channel_id")
+                    and (subscription.get("enriched_at") or 0) > time.time() - REFRESH_TTL)
+
+    def enrich_subscriptions(self, subscriptions: List[Dict], max_workers: int = 8,
+                             force: bool = False) -> List[bool]:
+        """
+        Enrich several subscriptions concurrently.
+
+        Each enrichment is dominated by independent yt-dlp and network waits, so they
+        run on a thread pool. Database writes need no extra locking: Pony serializes
+        SQLite write transactions across threads.
+
+        Args:
+            subscriptions: List of subscription dictionaries (updated in place)
+            max_workers: Maximum number of subscriptions enriched at the same time
+            force: Also re-enrich subscriptions enriched within REFRESH_TTL
+
+        Returns:
+            List of enrichment results, in the same order as the subscriptions
+        """
+        if not subscriptions:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(subscriptions))) as executor:
+            return list(executor.map(lambda s: self.enrich_subscription(s, force), subscriptions))
+
+    def _handle_channel_operations(self, subscription: Dict) -> Optional[Future]:
+        """
+        Handle database operations and start the thumbnail download for the channel.
+
+        Returns:
+            Future of the background thumbnail download, or None if there is nothing to download
+        """
         channel_id = subscription.get("channel_id")
         channel_name = subscription.get("channel")
 
         if not channel_id:
-            return
+            return None
 
         # Add/update channel in database
         add_channel(channel_id, channel_name)
 
         # Download channel thumbnail
-        if channel_name:
-            emit_subscription_event("thumbnail_download", {
-                "url": subscription["url"],
-                "message": f"Downloading thumbnail for {channel_name}..."
-            })
+        if not channel_name:
+            return None
 
+        self.emitter.post("thumbnail_download", {
+            "url": subscription["url"],
+            "message": f"Downloading thumbnail for {channel_name}..."
+        })
+        return self._thumbnail_executor.submit(self._download_thumbnail, subscription, channel_id, channel_name)
+
+    def _download_thumbnail(self, subscription: Dict, channel_id: str, channel_name: str) -> None:
+        """Download the channel thumbnail and record its path on the subscription."""
+        try:
             poster_path = self.thumbnail_service.download_channel_thumbnail(channel_id, channel_name)
-            if poster_path:
-                subscription["poster_path"] = poster_path
-                emit_subscription_event("thumbnail_complete", {
-                    "url": subscription["url"],
-                    "message": f"Thumbnail downloaded for {channel_name}"
-                })
+        except Exception as e:
+            logger.error("Error downloading thumbnail for %s: %s", channel_name, e)
+            return
+
+        if poster_path:
+            subscription["poster_path"] = poster_path
+            self.emitter.post("thumbnail_complete", {
+                "url": subscription["url"],
+                "message": f"Thumbnail downloaded for {channel_name}"
+            })
 
     def _handle_type_specific_operations(self, subscription: Dict, data: Dict, subscription_type: str) -> None:
         """Handle operations specific to subscription type (video, channel, playlist)."""
         if subscription_type == "video":
             self._handle_video_subscription(subscription, data)
         elif subscription_type == "channel":
-            self._handle_channel_subscription(subscription)
+            self._handle_channel_subscription(subscription, data)
         elif subscription_type == "playlist":
-            emit_subscription_event("playlist_detected", {
+            self.emitter.post("playlist_detected", {
                 "url": subscription["url"],
                 "message": f"Playlist subscription detected: {subscription.get('channel', 'Unknown')}"
             })
-            logger.info(f'Playlist subscription detected: {subscription.get("channel")}')
+            logger.info('Playlist subscription detected: %s', subscription.get("channel"))
 
     def _handle_video_subscription(self, subscription: Dict, data: Dict) -> None:
-        """Handle video-specific operations: add to database and download thumbnail."""
+        """Handle video-specific operations: add to database (the channel thumbnail is handled with the channel)."""
         video_id = data.get("id", "")
         if not video_id:
             return
 
         title = data.get("title", "Unknown Title")
         channel_id = subscription.get("channel_id")
-        channel_name = subscription.get("channel")
 
-        emit_subscription_event("video_add", {
+        self.emitter.post("video_add", {
             "url": subscription["url"],
             "message": f"Adding video: {title}"
         })
 
         add_video(video_id, title, channel_id)
-        logger.info(f'Added video to database: {title} ({video_id})')
+        logger.info('Added video to database: %s (%s)', title, video_id)
 
-        # Download thumbnail for single video's channel
-        if channel_id and channel_name:
-            self.thumbnail_service.download_channel_thumbnail(channel_id, channel_name)
-
-    def _handle_channel_subscription(self, subscription: Dict) -> None:
+    def _handle_channel_subscription(self, subscription: Dict, data: Dict) -> None:
         """Handle channel-specific operations: populate all videos."""
         channel_name = subscription.get("channel")
         channel_id = subscription.get("channel_id")
 
-        emit_subscription_event("video_discovery_start", {
+        self.emitter.post("video_discovery_start", {
             "url": subscription["url"],
             "message": f"Starting video discovery for channel: {channel_name}"
         })
 
-        logger.info(f'Channel subscription detected, populating videos for: {channel_name}')
+        logger.info('Channel subscription detected, populating videos for: %s', channel_name)
         if channel_id:
+            # A URL pointing at the channel's video tab already listed its videos; reuse them.
+            # Channel root URLs list the tabs instead, in which case discovery fetches the videos itself.
+            video_entries = [entry for entry in data.get("entries") or [] if entry.get("ie_key") == "Youtube"]
+
             # This will emit its own progress events via video_discovery namespace
-            success = self.video_discovery_service.populate_videos_from_channel(channel_id)
+            success = self.video_discovery_service.populate_videos_from_channel(
+                channel_id, entries=video_entries or None)
 
             if success:
-                emit_subscription_event("video_discovery_complete", {
+                self.emitter.post("video_discovery_complete", {
                     "url": subscription["url"],
                     "message": f"Video discovery complete for {channel_name}"
                 })
             else:
-                emit_subscription_event("video_discovery_error", {
+                self.emitter.post("video_discovery_error", {
                     "url": subscription["url"],
                     "message": f"Video discovery failed for {channel_name}"
                 })
\ No newline at end of file
@@ -5,8 +5,54 @@ Responsible for downloading and managing channel poster images.
 import subprocess
 import json
 import os
-from typing import Optional, List, Dict
-from util import logger, YTDLP_BINARY
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Optional, List, Dict, Tuple
+import requests
+from util import logger, YTDLP_BINARY, SUBPROCESS_CLOSE_FDS, clean_filename_part, json_loads
+from database import get_channel_avatar, set_channel_avatar
+from . import ytdlp_api
+
+# Shared session so avatar downloads reuse pooled TCP/TLS connections. Avatars come from a
+# couple of image hosts; keep enough idle connections per host for concurrent downloads.
+_HTTP = requests.Session()
+_HTTP.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+# Poster existence checks are repeated for every subscription sharing a channel;
+# remember the answer briefly instead of stat()ing each time: path -> (exists, checked_at)
+_POSTER_EXISTS_TTL = 60
+# Avatar URLs stored on the channel are reused for this long before asking yt-dlp again
+_AVATAR_URL_TTL = 30 * 86400
+_poster_exists_cache: Dict[str, Tuple[bool, float]] = {}
+
+# Channels whose avatar was handled recently, so subscriptions sharing a channel
+# skip the whole lookup: channel_id -> (poster path or None on failure, handled_at)
+_AVATAR_DONE_TTL = 600
+_avatar_done: Dict[str, Tuple[Optional[str], float]] = {}
+
+# Skip channel-tab sub-requests that don't contribute to the channel avatar
+_AVATAR_EXTRACTOR_ARGS = {"youtubetab": {"skip": ["authcheck"]}, "youtube": {"player_skip": ["configs", "webpage"]}}
+
+# The channel-info lookup runs on this pool; the video fallback (a listing plus a full video
+# extraction) only starts once it failed or hasn't answered within the head start
+_AVATAR_LOOKUPS = ThreadPoolExecutor(max_workers=8, thread_name_prefix="avatar-lookup")
+_AVATAR_FALLBACK_HEAD_START = 10
+
+
+def _poster_exists(path: str) -> bool:
+    """Existence check with a short-lived cache for poster paths."""
+    now = time.monotonic()
+    cached = _poster_exists_cache.get(path)
+    if cached and now - cached[1] < _POSTER_EXISTS_TTL:
+        return cached[0]
+
+    try:
+        os.stat(path)
+        exists = True
+    except FileNotFoundError:
+        exists = False
+    _poster_exists_cache[path] = (exists, now)
+    return exists
 
 
 class ThumbnailService:
@@ -27,44 +73,86 @@ class ThumbnailService:
         Returns:
             Path to downloaded thumbnail or None if failed
         """
-        clean_uploader = self._clean_filename_part(uploader_name)
+        done = _avatar_done.get(channel_id)
+        if done and time.monotonic() - done[1] < _AVATAR_DONE_TTL:
+            return done[0]
+
+        poster_path = self._download_channel_thumbnail(channel_id, uploader_name)
+        _avatar_done[channel_id] = (poster_path, time.monotonic())
+        return poster_path
+
+    def _download_channel_thumbnail(self, channel_id: str, uploader_name: str) -> Optional[str]:
+        """Resolve and download the avatar, skipping work that is already done on disk."""
+        clean_uploader = clean_filename_part(uploader_name)
         uploader_dir = os.path.join(self.data_dir, clean_uploader)
         poster_path = os.path.join(uploader_dir, "poster.jpg")
 
         # Check if poster already exists
-        if os.path.exists(poster_path):
+        if _poster_exists(poster_path):
             logger.info(f"Poster already exists for {clean_uploader}")
             return poster_path
 
         # Create directory
         os.makedirs(uploader_dir, exist_ok=True)
 
-        # Try multiple methods to get the avatar
-        avatar_url = (self._try_get_avatar_from_channel_info(channel_id, clean_uploader) or
-                      self._try_get_avatar_from_about_page(channel_id, clean_uploader) or
-                      self._try_get_avatar_from_video(channel_id, clean_uploader))
+        # A recently resolved avatar URL saves all yt-dlp lookups
+        cached_url = self._get_cached_avatar_url(channel_id)
+        if cached_url and self._download_image_from_url(cached_url, poster_path):
+            _poster_exists_cache[poster_path] = (True, time.monotonic())
+            logger.info(f"Downloaded avatar for {clean_uploader} from cached URL")
+            return poster_path
+
+        # The channel-info result is preferred even if the fallback answers first
+        preferred = _AVATAR_LOOKUPS.submit(self._try_get_avatar_from_channel_info, channel_id, clean_uploader)
+        fallback = None
+        try:
+            avatar_url = preferred.result(timeout=_AVATAR_FALLBACK_HEAD_START)
+        except FuturesTimeoutError:
+            fallback = _AVATAR_LOOKUPS.submit(self._try_get_avatar_from_video, channel_id, clean_uploader)
+            avatar_url = preferred.result()
+
+        if not avatar_url:
+            if fallback:
+                avatar_url = fallback.result()
+            else:
+                avatar_url = self._try_get_avatar_from_video(channel_id, clean_uploader)
 
         if avatar_url and self._download_image_from_url(avatar_url, poster_path):
+            _poster_exists_cache[poster_path] = (True, time.monotonic())
+            set_channel_avatar(channel_id, avatar_url)
             logger.info(f"Downloaded avatar for {clean_uploader}")
             return poster_path
 
         logger.warning(f"All avatar download methods failed for {clean_uploader}")
         return None
 
+    @staticmethod
+    def _get_cached_avatar_url(channel_id: str) -> Optional[str]:
+        """Return the stored avatar URL for a channel if it is still fresh."""
+        avatar_url, fetched_at = get_channel_avatar(channel_id) or (None, None)
+        if not avatar_url:
+            return None
+
+        if time.time() - (fetched_at or 0) >= _AVATAR_URL_TTL:
+            return None
+
+        return avatar_url
+
     def _try_get_avatar_from_channel_info(self, channel_id: str, clean_uploader: str) -> Optional[str]:
         """Try to get avatar URL from channel info."""
         try:
             logger.info(f"Getting channel avatar info for {clean_uploader}")
-            info_result = subprocess.run([
-                YTDLP_BINARY, "-J", "--flat-playlist", "--playlist-items", "1",
-                f"https://www.youtube.com/channel/{channel_id}"
-            ], capture_output=True, text=True, timeout=self.timeout)
-
-            if info_result.returncode != 0:
+            if ytdlp_api.IN_PROCESS:
+                # Channel-level fields are available without touching the lazy entries
+                with ytdlp_api.extract_info_unprocessed(
+                        f"https://www.youtube.com/channel/{channel_id}", self.timeout,
+                        extractor_args=_AVATAR_EXTRACTOR_ARGS) as data:
+                    channel_data = {key: data.get(key) for key in ("avatar_uncropped", "thumbnails")}
+            else:
+                channel_data = self._fetch_channel_avatar_fields(channel_id)
+            if not channel_data:
                 return None
 
-            channel_data = json.loads(info_result.stdout)
-
             # Try avatar_uncropped first (best quality)
             if channel_data.get("avatar_uncropped"):
                 logger.info(f"Found avatar_uncropped for {clean_uploader}")
@@ -78,61 +166,45 @@ class ThumbnailService:
             logger.warning(f"Failed to get channel info for {clean_uploader}: {e}")
             return None
 
-    def _try_get_avatar_from_about_page(self, channel_id: str, clean_uploader: str) -> Optional[str]:
-        """Try to get avatar URL from channel about page."""
-        try:
-            logger.info(f"Trying about page for {clean_uploader}")
-            about_result = subprocess.run([
-                YTDLP_BINARY, "-J", "--no-playlist",
-                f"https://www.youtube.com/channel/{channel_id}/about"
-            ], capture_output=True, text=True, timeout=self.timeout)
-
-            if about_result.returncode != 0:
-                return None
-
-            about_data = json.loads(about_result.stdout)
-            avatar_url = about_data.get("avatar_uncropped")
-
-            if avatar_url:
-                logger.info(f"Found avatar from about page for {clean_uploader}")
-                return avatar_url
+    def _fetch_channel_avatar_fields(self, channel_id: str) -> Optional[Dict]:
+        """Run the yt-dlp executable for the channel's avatar_uncropped and thumbnails fields."""
+        info_result = subprocess.run([
+                YTDLP_BINARY, "--flat-playlist", "--playlist-items", "1",
+                # Print only the avatar fields of the channel instead of the whole -J dump
+                "--print", "playlist:%(.{avatar_uncropped,thumbnails})j",
+                # Skip sub-requests that don't contribute to the channel avatar
+                "--extractor-args", "youtubetab:skip=authcheck",
+                "--extractor-args", "youtube:player_skip=configs,webpage",
+                f"https://www.youtube.com/channel/{channel_id}"
+            ], capture_output=True, close_fds=SUBPROCESS_CLOSE_FDS, timeout=self.timeout)
 
-        except (subprocess.TimeoutExpired, json.JSONDecodeError, Exception) as e:
-            logger.warning(f"Failed to get about page for {clean_uploader}: {e}")
+        if info_result.returncode != 0:
+            return None
 
-        return None
+        return json_loads(info_result.stdout)
 
     def _try_get_avatar_from_video(self, channel_id: str, clean_uploader: str) -> Optional[str]:
         """Try to extract avatar from a video in the channel."""
         try:
             logger.info(f"Trying to extract avatar from videos for {clean_uploader}")
-            video_result = subprocess.run([
-                YTDLP_BINARY, "-J", "--playlist-items", "1",
-                f"https://www.youtube.com/channel/{channel_id}/videos"
-            ], capture_output=True, text=True, timeout=self.timeout)
-
-            if video_result.returncode != 0:
+            if ytdlp_api.IN_PROCESS:
+                detailed_data = self._extract_latest_video_in_process(channel_id)
+            else:
+                # Without --flat-playlist the first entry is fully extracted in the same run,
+                # so one invocation yields the latest video's uploader fields
+                video_result = subprocess.run([
+                    YTDLP_BINARY, "--playlist-items", "1",
+                    "--print", "%(.{uploader_avatar,channel_avatar,uploader_thumbnail})j",
+                    f"https://www.youtube.com/channel/{channel_id}/videos"
+                ], capture_output=True, close_fds=SUBPROCESS_CLOSE_FDS, timeout=self.timeout)
+
+                if video_result.returncode != 0 or not video_result.stdout.strip():
+                    return None
+
+                detailed_data = json_loads(video_result.stdout.splitlines()[0])
+            if not detailed_data:
                 return None
 
-            video_data = json.loads(video_result.stdout)
-            entries = video_data.get("entries", [])
-
-            if not entries:
-                return None
-
-            # Get detailed info for the first video
-            video_id = entries[0].get("id")
-            if not video_id:
-                return None
-
-            detailed_result = subprocess.run([
-                YTDLP_BINARY, "-J", f"https://www.youtube.com/watch?v={video_id}"
-            ], capture_output=True, text=True, timeout=self.timeout)
-
-            if detailed_result.returncode != 0:
-                return None
-
-            detailed_data = json.loads(detailed_result.stdout)
             avatar_url = (detailed_data.get("uploader_avatar") or
                           detailed_data.get("channel_avatar") or
                           detailed_data.get("uploader_thumbnail"))
@@ -146,53 +218,70 @@ class ThumbnailService:
 
         return None
 
+    def _extract_latest_video_in_process(self, channel_id: str) -> Optional[Dict]:
+        """Fully extract the channel's latest video through the in-process yt-dlp API."""
+        with ytdlp_api.extract_info_unprocessed(
+                f"https://www.youtube.com/channel/{channel_id}/videos", self.timeout) as listing:
+            # Only the first page of the lazy entries is requested
+            first = next(iter(listing.get("entries") or ()), None)
+        if not first or not first.get("id"):
+            return None
+        return ytdlp_api.extract_info(f"https://www.youtube.com/watch?v={first['id']}",
+                                      flat=False, timeout=self.timeout)
+
     def _find_best_avatar_thumbnail(self, thumbnails: List[Dict], clean_uploader: str) -> Optional[str]:
         """Find the best avatar thumbnail from a list, avoiding banners."""
         if not thumbnails:
             return None
 
-        avatar_candidates = []
+        # Single pass: track the largest square avatar and the smallest thumbnail overall
+        best_square = None
+        best_square_area = -1
+        smallest = None
+        smallest_area = None
+
         for thumb in thumbnails:
-            width = thumb.get("width", 0)
-            height = thumb.get("height", 0)
-            url = thumb.get("url", "")
+            width = thumb.get("width") or 0
+            height = thumb.get("height") or 0
+            area = width * height
+
+            if smallest is None or area < smallest_area:
+                smallest, smallest_area = thumb, area
 
             # Skip banner images (wide aspect ratio or contains banner indicators)
-            if width > 0 and height > 0:
-                aspect_ratio = width / height
-                if (0.8 <= aspect_ratio <= 1.25 and
+            if width > 0 and height > 0 and area > best_square_area:
+                url = thumb.get("url", "")
+                if (0.8 <= width / height <= 1.25 and
                         "fcrop64" not in url and
                         "banner" not in url.lower()):
-                    avatar_candidates.append(thumb)
+                    best_square, best_square_area = thumb, area
 
-        if avatar_candidates:
-            # Get the highest resolution square avatar
-            best_thumb = max(avatar_candidates, key=lambda x: (x.get("width", 0) * x.get("height", 0)))
+        if best_square:
+            # Highest resolution square avatar
             logger.info(f"Found square avatar thumbnail for {clean_uploader}")
-            return best_thumb.get("url")
+            return best_square.get("url")
 
         # Fallback to smallest thumbnail
-        if thumbnails:
-            smallest_thumb = min(thumbnails, key=lambda x: (x.get("width", 0) * x.get("height", 0)))
-            logger.info(f"Using smallest thumbnail as avatar fallback for {clean_uploader}")
-            return smallest_thumb.get("url")
-
-        return None
+        logger.info(f"Using smallest thumbnail as avatar fallback for {clean_uploader}")
+        return smallest.get("url")
 
     def _download_image_from_url(self, url: str, file_path: str) -> bool:
-        """Download an image from URL using curl."""
+        """Download an image from URL, streaming it to disk."""
         try:
-            result = subprocess.run([
-                "curl", "-L", "-o", file_path, url
-            ], capture_output=True, text=True, timeout=self.timeout)
+            with _HTTP.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(file_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
 
-            return result.returncode == 0 and os.path.exists(file_path)
+            # open() created the file and raise_for_status() rejected HTTP errors
+            return True
 
         except Exception as e:
             logger.error(f"Failed to download image from {url}: {e}")
+            # Don't leave a partial poster behind, it would be treated as already downloaded
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
             return False
-
-    @staticmethod
-    def _clean_filename_part(name: str) -> str:
-        """Clean a string to be safe for use in filenames."""
-        return name.replace("/", "-").replace("\\", "-").strip()
\ No newline at end of file
@@ -1,51 +1,76 @@
 """
 Video Discovery Service - Simplified without filename generation complexity.
 """
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from typing import Dict, List, Optional
-from util import logger
-from database import get_channel_by_id, add_video, video_exists, get_parameters
+from util import logger, DISCOVERY_WORKERS
+from database import get_channel_by_id, add_video, add_videos, existing_video_ids
+from websocket_events import emit_progress_event
+
+# Videos written per transaction while populating a channel
+_INSERT_BATCH_SIZE = 500
 
 
 class VideoDiscoveryService:
     """Service for discovering and managing videos from channels."""
 
-    def __init__(self, metadata_service):
+    def __init__(self, metadata_service, max_workers: int = DISCOVERY_WORKERS):
         self.metadata_service = metadata_service
+        self.max_workers = max_workers
 
-    def populate_videos_from_channel(self, channel_id: str, limit: int = 50) -> bool:
+    def populate_videos_from_channel(self, channel_id: str, limit: int = 50,
+                                     entries: Optional[List[Dict]] = None) -> bool:
         """
         Populate the videos table with all videos from a channel.
 
         Args:
             channel_id: The YouTube channel ID
             limit: Maximum number of videos to process (to avoid timeouts)
+            entries: Video entries already fetched for this channel; skips listing the channel again
 
         Returns:
             True if successful, False otherwise
         """
         channel = get_channel_by_id(channel_id)
         if not channel:
-            logger.error(f"Channel not found: {channel_id}")
+            logger.error("Channel not found: %s", channel_id)
             return False
 
         try:
-            # Get list of videos using flat-playlist
-            entries = self.metadata_service.fetch_channel_video_list(channel_id)
+            # Get list of videos using flat-playlist, only reading as far as the limit
+            if entries is None:
+                entries = self.metadata_service.fetch_channel_video_list(channel_id, limit=limit)
+            entries = list(islice(entries, limit))
             if not entries:
                 return False
 
-            # Limit the number of videos to process
-            entries = entries[:limit]
-            logger.info(f"Processing {len(entries)} videos for channel: {channel['name']}")
+            logger.info("Processing %s videos for channel: %s", len(entries), channel["name"])
+
+            # One IN query for the whole page instead of a lookup per entry
+            known_ids = existing_video_ids(entry["id"] for entry in entries if entry.get("id"))
+            new_entries = [entry for entry in entries if entry.get("id") and entry["id"] not in known_ids]
+
+            summaries = self._fetch_video_summaries([entry["id"] for entry in new_entries])
+
+            rows = []
+            for entry in new_entries:
+                summary = summaries.get(entry["id"])
+                if summary:
+                    rows.append((entry["id"], summary.get("title") or "Unknown Title", summary.get("filesize")))
+                else:
+                    rows.append((entry["id"], entry.get("title") or "Unknown Title", None))
 
-            for i, entry in enumerate(entries):
-                self._process_channel_video_entry(entry, i + 1, len(entries), channel)
+            for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+                add_videos(rows[start:start + _INSERT_BATCH_SIZE], channel["channel_id"])
+                emit_progress_event("video_discovery", min(start + _INSERT_BATCH_SIZE, len(rows)), len(rows),
+                                    f"Added videos for {channel['name']}", {"channel_id": channel_id})
 
-            logger.info(f'Populated {len(entries)} videos for channel: {channel["name"]}')
+            logger.info("Populated %s videos for channel: %s", len(entries), channel["name"])
             return True
 
         except Exception as e:
-            logger.error(f"Error populating videos for channel {channel_id}: {e}")
+            logger.error("Error populating videos for channel %s: %s", channel_id, e)
             return False
 
     def process_single_video_with_filesize(self, video_id: str, channel_id: str = None) -> Optional[Dict]:
@@ -64,7 +89,7 @@ class VideoDiscoveryService:
             metadata = self.metadata_service.get_video_metadata_with_filesize(video_id)
 
             if not metadata:
-                logger.error(f"Could not get metadata for video {video_id}")
+                logger.error("Could not get metadata for video %s", video_id)
                 return None
 
             # Add to database with filesize
@@ -75,45 +100,32 @@ class VideoDiscoveryService:
                 filesize=metadata.get("filesize")
             )
 
-            logger.info(f"Processed video with filesize: {metadata.get('title')} - {metadata.get('filesize', 'unknown')} bytes")
+            logger.info("Processed video with filesize: %s - %s bytes",
+                        metadata.get("title"), metadata.get("filesize", "unknown"))
             return video_data
 
         except Exception as e:
-            logger.error(f"Error processing video {video_id}: {e}")
+            logger.error("Error processing video %s: %s", video_id, e)
             return None
 
-    def _process_channel_video_entry(self, entry: Dict, current_index: int, total_count: int, channel: Dict) -> None:
-        """Process a single video entry from a channel's video list."""
-        video_id = entry.get("id", "")
-        if not video_id or video_exists(video_id):
-            return
-
-        logger.info(f"Getting detailed info for video {current_index}/{total_count}: {video_id}")
-
-        # Get filesize separately for better reliability
-        filesize = self.metadata_service.get_video_filesize(video_id)
-
-        # Try to get detailed info, fall back to basic info if it fails
-        video_data = self.metadata_service.fetch_detailed_video_info(video_id)
-        if video_data:
-            self._add_video_from_detailed_data(video_data, channel, filesize)
-        else:
-            self._add_video_from_basic_data(entry, channel, filesize)
-
-    @staticmethod
-    def _add_video_from_detailed_data(video_data: Dict, channel: Dict, filesize: Optional[int]) -> None:
-        """Add video to database using detailed video data."""
-        video_id = video_data.get("id", "")
-        title = video_data.get("title", "Unknown Title")
-        channel_id = channel.get("channel_id")
-
-        add_video(video_id, title, channel_id, filesize)
-
-    @staticmethod
-    def _add_video_from_basic_data(entry: Dict, channel: Dict, filesize: Optional[int]) -> None:
-        """Add video to database using basic entry data (fallback)."""
-        video_id = entry.get("id", "")
-        title = entry.get("title", "Unknown Title")
-        channel_id = channel.get("channel_id")
-
-        add_video(video_id, title, channel_id, filesize)
\ No newline at end of file
+    def _fetch_video_summaries(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch title and filesize for new videos.
+
+        The IDs are split into at most max_workers batches; each batch is a single
+        yt-dlp invocation and the batches run concurrently, so process startup is
+        paid once per batch instead of once per video.
+        """
+        if not video_ids:
+            return {}
+
+        batch_size = -(-len(video_ids) // self.max_workers)
+        batches = [video_ids[i:i + batch_size] for i in range(0, len(video_ids), batch_size)]
+        logger.info("Getting detailed info for %s videos in %s batches", len(video_ids), len(batches))
+
+        summaries = {}
+        # yt-dlp lookups are network-bound, so run them concurrently and keep DB writes in the caller
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            for batch_summaries in executor.map(self.metadata_service.fetch_video_summaries, batches):
+                summaries.update(batch_summaries)
+        return summaries
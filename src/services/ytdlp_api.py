@@ -0,0 +1,190 @@
+"""
+yt-dlp API - In-process access to the yt_dlp package.
+Lets the services extract metadata without starting a yt-dlp interpreter per call.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, Tuple
+from util import YTDLP_IN_PROCESS
+
+try:
+    from yt_dlp import YoutubeDL, parse_options
+    from yt_dlp.utils import DownloadCancelled, DownloadError
+except ImportError:
+    # Without the yt-dlp package, metadata is fetched by running the YTDLP_BINARY executable
+    YoutubeDL = parse_options = DownloadCancelled = DownloadError = None
+
+# The in-process API avoids interpreter startup per call; the executable stays available as a fallback
+IN_PROCESS = YoutubeDL is not None and YTDLP_IN_PROCESS
+
+_BASE_OPTIONS = {"quiet": True, "no_warnings": True, "skip_download": True}
+
+# Socket timeout for downloads whose parameters don't set --socket-timeout, so a stalled
+# connection fails (and is retried by yt-dlp) instead of blocking the download forever
+_DOWNLOAD_SOCKET_TIMEOUT = 30
+
+# Process-wide pools of extractors keyed by flat-playlist mode. A YoutubeDL instance is not
+# thread-safe, so each call checks one out exclusively; instances are never closed, keeping
+# their cookie jar and keep-alive connections warm. LIFO order hands out the most recently
+# used (warmest) instance first.
+_YDL_POOL_SIZE = os.cpu_count() or 4
+_ydl_pools = {True: queue.LifoQueue(), False: queue.LifoQueue()}
+_ydl_created = {True: 0, False: 0}
+_ydl_lock = threading.Lock()
+
+
+def _checkout_ydl(flat: bool, timeout: int):
+    """Take an idle YoutubeDL from the pool, creating one while under _YDL_POOL_SIZE."""
+    pool = _ydl_pools[flat]
+    try:
+        return pool.get_nowait()
+    except queue.Empty:
+        pass
+
+    with _ydl_lock:
+        create = _ydl_created[flat] < _YDL_POOL_SIZE
+        if create:
+            _ydl_created[flat] += 1
+
+    if not create:
+        return pool.get()
+
+    options = dict(_BASE_OPTIONS, socket_timeout=timeout)
+    if flat:
+        options["extract_flat"] = "in_playlist"
+    try:
+        return YoutubeDL(options)
+    except Exception:
+        with _ydl_lock:
+            _ydl_created[flat] -= 1
+        raise
+
+
+def extract_info(url: str, flat: bool, timeout: int) -> Dict:
+    """
+    Equivalent of `yt-dlp [--flat-playlist] -J url` without spawning a process.
+
+    Args:
+        url: The URL to extract
+        flat: List playlist entries without extracting each of them
+        timeout: Socket timeout in seconds
+
+    Returns:
+        The sanitized info dict
+    """
+    ydl = _checkout_ydl(flat, timeout)
+    try:
+        info = ydl.extract_info(url, download=False)
+        return ydl.sanitize_info(info)
+    finally:
+        _ydl_pools[flat].put(ydl)
+
+
+@contextmanager
+def extract_info_unprocessed(url: str, timeout: int, **options) -> Iterator[Dict]:
+    """
+    Run only the extractor for a URL (yt-dlp's process=False), following URL redirects.
+
+    Playlist entries stay a lazy generator: further pages are only requested as
+    entries are consumed, and top-level fields (title, thumbnails, ...) are
+    available without touching the entries at all. The entries are fetched
+    through a YoutubeDL of their own, which is closed when the block exits, so
+    consume everything needed inside it.
+
+    Args:
+        url: The URL to extract
+        timeout: Socket timeout in seconds
+        **options: Extra YoutubeDL options (e.g. extractor_args)
+
+    Yields:
+        The raw extractor result
+    """
+    with YoutubeDL(dict(_BASE_OPTIONS, socket_timeout=timeout, extract_flat="in_playlist", **options)) as ydl:
+        data = ydl.extract_info(url, download=False, process=False)
+        # Follow redirects (e.g. a handle resolving to the canonical channel tab)
+        for _ in range(3):
+            if data.get("_type") not in ("url", "url_transparent"):
+                break
+            data = ydl.extract_info(data["url"], ie_key=data.get("ie_key"), download=False, process=False)
+        yield data
+
+
+@lru_cache(maxsize=8)
+def _download_options(args: Tuple[str, ...]) -> Dict:
+    """Parse yt-dlp command line arguments into YoutubeDL options, once per distinct argument list."""
+    return parse_options(list(args)).ydl_opts
+
+
+class _LogAdapter:
+    """Routes yt-dlp's messages to a logging.Logger, prefixed with the item being processed."""
+
+    def __init__(self, log: logging.Logger, prefix: str):
+        self.log = log
+        self.prefix = prefix
+
+    def debug(self, message: str) -> None:
+        # yt-dlp sends regular progress output through debug(); real debug lines carry a prefix
+        if message.startswith("[debug] "):
+            self.log.debug("%s: %s", self.prefix, message)
+        else:
+            self.log.info("%s: %s", self.prefix, message)
+
+    def info(self, message: str) -> None:
+        self.log.info("%s: %s", self.prefix, message)
+
+    def warning(self, message: str) -> None:
+        self.log.warning("%s: %s", self.prefix, message)
+
+    def error(self, message: str) -> None:
+        self.log.error("%s: %s", self.prefix, message)
+
+
+def download(url: str, args: Tuple[str, ...], log: logging.Logger, log_prefix: str, timeout: float) -> int:
+    """
+    Equivalent of `yt-dlp <args> url` without spawning a process.
+
+    A YoutubeDL instance is not thread-safe and downloads may run concurrently,
+    so each call gets its own instance built from the cached parsed options.
+
+    A running download can't be killed from another thread like a process can, so
+    the deadline is checked from yt-dlp's progress and postprocessor hooks, which
+    fire continuously while data arrives; the socket timeout bounds the time a
+    stalled connection can go without firing them.
+
+    Args:
+        url: The URL to download
+        args: yt-dlp command line arguments (without the URL)
+        log: Logger receiving yt-dlp's output
+        log_prefix: Prefix for every logged line, e.g. the channel name
+        timeout: Seconds after which the download is aborted
+
+    Returns:
+        yt-dlp's exit code (0 on success)
+
+    Raises:
+        TimeoutError: The download ran past the timeout
+    """
+    deadline = time.monotonic() + timeout
+
+    def check_deadline(_status):
+        if time.monotonic() > deadline:
+            raise DownloadCancelled(f"Download exceeded {timeout} seconds")
+
+    options = dict(_download_options(args), logger=_LogAdapter(log, log_prefix),
+                   progress_hooks=[check_deadline], postprocessor_hooks=[check_deadline])
+    if options.get("socket_timeout") is None:
+        options["socket_timeout"] = _DOWNLOAD_SOCKET_TIMEOUT
+
+    with YoutubeDL(options) as ydl:
+        try:
+            return ydl.download([url])
+        except DownloadCancelled as e:
+            raise TimeoutError(str(e)) from e
+        except DownloadError:
+            # Already reported through the logger; the executable exits with 1 here too
+            return 1
@@ -1,5 +1,57 @@
-import subprocess, shlex
-from util import YTDLP_BINARY, logger
+import subprocess, shlex, threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from util import YTDLP_BINARY, SUBSCRIPTION_WORKERS, SUBPROCESS_CLOSE_FDS, logger
+from services import ytdlp_api
+
+# 1 hour timeout for large downloads
+_DOWNLOAD_TIMEOUT = 3600
+
+
+@lru_cache(maxsize=32)
+def _parameter_args(parameters):
+    """Tokenize the yt-dlp parameter string once per distinct value."""
+    return tuple(shlex.split(parameters))
+
+
+def process_subscriptions(subscriptions, parameters, workers=None):
+    """
+    Process several subscriptions concurrently.
+
+    Downloads are network and disk bound, so they overlap on a thread pool.
+    Subscriptions of the same channel write to the same uploader folder and
+    can list the same videos, so they run one after another on a single
+    worker: otherwise two downloads could both miss the video in the
+    --download-archive and write the same file at once.
+
+    Args:
+        subscriptions: List of subscription dictionaries
+        parameters: yt-dlp parameter string
+        workers: Maximum number of concurrent downloads (default: SUB_WORKERS)
+
+    Returns:
+        List of process_subscription results, one per subscription
+    """
+    if not subscriptions:
+        return []
+
+    # Subscription indexes per channel (by URL when the channel isn't known yet)
+    groups = {}
+    for index, subscription in enumerate(subscriptions):
+        groups.setdefault(subscription.get('channel_id') or subscription['url'], []).append(index)
+
+    results = [None] * len(subscriptions)
+
+    def process_group(indexes):
+        for index in indexes:
+            results[index] = process_subscription(subscriptions[index], parameters)
+
+    workers = workers or SUBSCRIPTION_WORKERS
+    with ThreadPoolExecutor(max_workers=min(workers, len(groups)),
+                            thread_name_prefix="subscription") as executor:
+        # list() re-raises any exception from a group
+        list(executor.map(process_group, groups.values()))
+    return results
 
 
 def process_subscription(subscription, parameters):
@@ -8,46 +60,72 @@ def process_subscription(subscription, parameters):
     subscription_type = subscription.get('type', 'video')
     channel_name = subscription.get('channel', 'Unknown')
 
-    logger.info(f"Processing {channel_name} ({url}) - type: {subscription_type}")
+    logger.info("Processing %s (%s) - type: %s", channel_name, url, subscription_type)
+
+    if ytdlp_api.IN_PROCESS:
+        return _download_in_process(url, parameters, channel_name)
 
     # Build base command with user parameters
-    cmd = [YTDLP_BINARY] + shlex.split(parameters)
-    cmd.append(url)
+    cmd = [YTDLP_BINARY, *_parameter_args(parameters), url]
 
-    logger.info(f"Executing command: {' '.join(cmd)}")
+    logger.info("Executing command: %s", shlex.join(cmd))
 
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=3600  # 1 hour timeout for large downloads
-        )
-
-        # Log the output for visibility
-        if result.stdout:
-            logger.info(f"yt-dlp stdout for {channel_name}:")
-            for line in result.stdout.strip().split('\n'):
-                if line.strip():
-                    logger.info(f"  {line}")
-
-        if result.stderr:
-            logger.warning(f"yt-dlp stderr for {channel_name}:")
-            for line in result.stderr.strip().split('\n'):
-                if line.strip():
-                    logger.warning(f"  {line}")
-
-        if result.returncode == 0:
-            logger.info(f"Successfully completed processing {channel_name}")
-        else:
-            logger.error(f"yt-dlp failed for {channel_name} with return code {result.returncode}")
-
-        return result
-
-    except subprocess.TimeoutExpired:
-        logger.error(f"Timeout processing {channel_name} - operation took longer than 1 hour")
+        # stderr is merged into stdout and logged as it arrives instead of buffering the whole transcript
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                close_fds=SUBPROCESS_CLOSE_FDS)
+    except Exception as e:
+        logger.error("Unexpected error processing %s: %s", channel_name, e)
         return None
+
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    watchdog = threading.Timer(_DOWNLOAD_TIMEOUT, kill_on_timeout)
+    watchdog.start()
+    try:
+        for line in proc.stdout:
+            line = line.rstrip()
+            if line:
+                logger.info("  %s: %s", channel_name, line)
     except Exception as e:
-        logger.error(f"Unexpected error processing {channel_name}: {e}")
-        return None
\ No newline at end of file
+        logger.error("Unexpected error processing %s: %s", channel_name, e)
+        proc.kill()
+        return None
+    finally:
+        watchdog.cancel()
+        returncode = proc.wait()
+        proc.stdout.close()
+
+    if timed_out.is_set():
+        logger.error("Timeout processing %s - operation took longer than 1 hour", channel_name)
+        return None
+
+    if returncode == 0:
+        logger.info("Successfully completed processing %s", channel_name)
+    else:
+        logger.error("yt-dlp failed for %s with return code %s", channel_name, returncode)
+
+    return subprocess.CompletedProcess(cmd, returncode)
+
+
+def _download_in_process(url, parameters, channel_name):
+    """process_subscription through the yt_dlp package instead of the YTDLP_BINARY executable."""
+    try:
+        returncode = ytdlp_api.download(url, _parameter_args(parameters), logger, channel_name, _DOWNLOAD_TIMEOUT)
+    except TimeoutError:
+        logger.error("Timeout processing %s - operation took longer than 1 hour", channel_name)
+        return None
+    except Exception as e:
+        logger.error("Unexpected error processing %s: %s", channel_name, e)
+        return None
+
+    if returncode == 0:
+        logger.info("Successfully completed processing %s", channel_name)
+    else:
+        logger.error("yt-dlp failed for %s with return code %s", channel_name, returncode)
+
+    return subprocess.CompletedProcess([url], returncode)
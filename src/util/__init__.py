@@ -1,15 +1,64 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 
+try:
+    # orjson parses the multi-megabyte yt-dlp dumps several times faster and accepts bytes
+    from orjson import loads as json_loads, dumps as json_dumps
+except ImportError:
+    import json
+    from json import loads as json_loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
 # Configuration for yt-dlp binary location
 YTDLP_BINARY = os.getenv('YTDLP_BINARY', '/usr/local/bin/yt-dlp')
 
-# Configure root logger
+# Set YTDLP_IN_PROCESS=0 to always run the YTDLP_BINARY executable instead of the yt_dlp package
+YTDLP_IN_PROCESS = os.getenv('YTDLP_IN_PROCESS', '1') != '0'
+
+# yt-dlp metadata persisted under config/cache is reused for this many seconds
+METADATA_CACHE_MAX_AGE = int(os.getenv('METADATA_CACHE_MAX_AGE', '3600'))
+
+# Concurrent yt-dlp lookups while discovering a channel's videos; lower it if YouTube throttles
+DISCOVERY_WORKERS = int(os.getenv('YTDLP_DISCOVERY_WORKERS', '8'))
+
+# Subscriptions downloaded at the same time by the scheduler; add --limit-rate to the
+# yt-dlp parameters if the combined downloads saturate the connection
+SUBSCRIPTION_WORKERS = int(os.getenv('SUB_WORKERS', '4'))
+
+# Python-created file descriptors are non-inheritable, so on Linux the child
+# process can skip sweeping the fd table before exec
+SUBPROCESS_CLOSE_FDS = not sys.platform.startswith('linux')
+
+# Path separators mapped to dashes in a single translate() pass
+_FILENAME_SLASH_TABLE = str.maketrans({"/": "-", "\\": "-"})
+
+
+def clean_filename_part(name: str) -> str:
+    """Clean a string to be safe for use as a single path component (e.g. an uploader directory)."""
+    return name.translate(_FILENAME_SLASH_TABLE).strip()
+
+
+# Configure root logger. Records are only queued by the logging thread; formatting and the
+# stdout write happen on the listener's thread, so worker threads don't serialize on I/O.
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, _stdout_handler, respect_handler_level=True)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# Only merge the message arguments; the listener's handler applies the real format
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))
 logging.basicConfig(
     level=logging.INFO,  # or DEBUG for more verbosity
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
+    handlers=[_queue_handler]
 )
+_log_listener.start()
+# Flush queued records on interpreter exit
+atexit.register(_log_listener.stop)
 
 logger = logging.getLogger(__name__)
\ No newline at end of file
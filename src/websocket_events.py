@@ -4,12 +4,20 @@ WebSocket Event Emitter - Utility for sending real-time updates to frontend.
 This module provides a clean interface for services to emit progress events
 without tight coupling to Flask-SocketIO implementation details.
 """
-from typing import Dict, Any, Optional
+import queue
+import threading
+import time
+from typing import Dict, Any, FrozenSet, Optional
 from util import logger
 
 # Global reference to SocketIO instance (set by app.py)
 _socketio = None
 
+# Connected WebSocket clients (maintained by app.py's connect/disconnect handlers);
+# with nobody listening, events are dropped before their payload is even built
+_client_count = 0
+_client_lock = threading.Lock()
+
 
 def init_websocket_events(socketio_instance):
     """Initialize the WebSocket event system with SocketIO instance."""
@@ -18,6 +26,25 @@ def init_websocket_events(socketio_instance):
     logger.info("WebSocket events initialized")
 
 
+def client_connected():
+    """Record a new WebSocket client."""
+    global _client_count
+    with _client_lock:
+        _client_count += 1
+
+
+def client_disconnected():
+    """Record a WebSocket client going away."""
+    global _client_count
+    with _client_lock:
+        _client_count = max(_client_count - 1, 0)
+
+
+def _has_listeners() -> bool:
+    """True if events would reach anyone."""
+    return _socketio is not None and _client_count > 0
+
+
 def emit_event(namespace: str, event_type: str, data: Dict[str, Any], room: Optional[str] = None):
     """
     Emit a WebSocket event to connected clients.
@@ -28,8 +55,7 @@ def emit_event(namespace: str, event_type: str, data: Dict[str, Any], room: Opti
         data: Event data dictionary
         room: Optional room to emit to (for user-specific events)
     """
-    if not _socketio:
-        logger.debug(f"WebSocket not initialized, skipping event: {namespace}.{event_type}")
+    if not _has_listeners():
         return
 
     event_payload = {
@@ -46,10 +72,65 @@ def emit_event(namespace: str, event_type: str, data: Dict[str, Any], room: Opti
         logger.error(f"Failed to emit WebSocket event: {e}")
 
 
+class CoalescingEmitter:
+    """
+    Emits events for one namespace from a background thread.
+
+    post() only enqueues, so callers never wait on serialization or the socket.
+    Events arriving within `window` seconds are collapsed to the latest one per
+    (url, event_type); terminal event types are always delivered individually.
+    """
+
+    def __init__(self, namespace: str, window: float = 0.1,
+                 terminal_types: FrozenSet[str] = frozenset({"error", "video_discovery_complete"})):
+        self.namespace = namespace
+        self.window = window
+        self.terminal_types = terminal_types
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def post(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Queue an event for emission; returns immediately."""
+        if not _has_listeners():
+            return
+
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name=f"emit-{self.namespace}", daemon=True)
+                    self._worker.start()
+
+        self._queue.put((event_type, data))
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Latest payload wins, but each key keeps the position of its first event
+            pending: Dict[Any, tuple] = {}
+            for index, (event_type, data) in enumerate(batch):
+                key = index if event_type in self.terminal_types else (data.get("url"), event_type)
+                pending[key] = (event_type, data)
+
+            for event_type, data in pending.values():
+                emit_event(self.namespace, event_type, data)
+
+
+# Shared by the app and SubscriptionService so all enrichment events leave in posting order
+subscription_emitter = CoalescingEmitter("subscription_enrichment")
+
+
 # Convenience functions for common event types
 def emit_subscription_event(event_type: str, subscription_data: Dict[str, Any]):
-    """Emit subscription enrichment event."""
-    emit_event("subscription_enrichment", event_type, subscription_data)
+    """Emit subscription enrichment event (asynchronously, see CoalescingEmitter)."""
+    subscription_emitter.post(event_type, subscription_data)
 
 
 def emit_video_discovery_event(event_type: str, discovery_data: Dict[str, Any]):
@@ -59,14 +140,14 @@ def emit_video_discovery_event(event_type: str, discovery_data: Dict[str, Any]):
 
 def emit_progress_event(namespace: str, current: int, total: int, message: str, extra_data: Dict = None):
     """Emit a progress event with standardized format."""
-    data = {
+    if not _has_listeners():
+        return
+
+    # One dict display, extra fields included, instead of building the dict and then update()ing it
+    emit_event(namespace, "progress", {
         "current": current,
         "total": total,
         "percent": round((current / total * 100), 1) if total > 0 else 0,
-        "message": message
-    }
-
-    if extra_data:
-        data.update(extra_data)
-
-    emit_event(namespace, "progress", data)
\ No newline at end of file
+        "message": message,
+        **(extra_data or {})
+    })